@@ -0,0 +1,626 @@
+import hashlib
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from config import PROBABILITY_CONNECTION_MUTATION, PROBABILITY_CROSSOVER_CONNECTION_DISABLED, PROBABILITY_NODE_MUTATION, PROBABILITY_WEIGHT_MUTATION
+
+from src.connection_gene import ConnectionGene, mutated_weight
+from src.feed_forward import FeedForwardNetwork
+from src.gene_store import DEFAULT_REGISTRY, InnovationRegistry
+from src.genome import Genome
+from src.node_gene import NodeGene
+from utils.enums import NodeType
+
+
+class NodeView:
+    """
+    Node row of an ArrayGenome, valid until the next structural change of the genome
+    """
+    __slots__ = ('_genome', '_row')
+
+    def __init__(self, genome: 'ArrayGenome', row: int) -> None:
+        self._genome = genome
+        self._row = row
+
+    @property
+    def innovation_number(self) -> int:
+        return int(self._genome.node_ids[self._row])
+
+    @property
+    def weight(self) -> float:
+        return float(self._genome.node_weights[self._row])
+
+    @property
+    def node_type(self) -> NodeType:
+        return NodeType(int(self._genome.node_types[self._row]))
+
+    @property
+    def x_axis(self) -> float:
+        return float(self._genome.node_x_axis[self._row])
+
+    def copy(self) -> NodeGene:
+        return NodeGene(
+            innovation_number=self.innovation_number,
+            weight=self.weight,
+            node_type=self.node_type,
+            x_axis=self.x_axis,
+        )
+
+    def __eq__(self, __o: object) -> bool:
+        if isinstance(__o, (NodeView, NodeGene)):
+            return self.innovation_number == __o.innovation_number
+        return False
+
+    def __hash__(self) -> int:
+        return self.innovation_number
+
+    def __str__(self) -> str:
+        return f"{self.innovation_number}"
+
+
+class ConnectionView:
+    """
+    Connection row of an ArrayGenome, valid until the next structural change of the genome
+    """
+    __slots__ = ('_genome', '_row')
+
+    def __init__(self, genome: 'ArrayGenome', row: int) -> None:
+        self._genome = genome
+        self._row = row
+
+    @property
+    def innovation_number(self) -> int:
+        return int(self._genome.connection_innovations[self._row])
+
+    @property
+    def from_node(self) -> int:
+        return int(self._genome.connection_from[self._row])
+
+    @property
+    def to_node(self) -> int:
+        return int(self._genome.connection_to[self._row])
+
+    @property
+    def weight(self) -> float:
+        return float(self._genome.connection_weights[self._row])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._genome.connection_enabled[self._row])
+
+    def mutate_weight(self):
+        self._genome._set_connection_weight(self._row, mutated_weight(self.weight))
+
+    def mutate_enabled(self):
+        self._genome._set_connection_enabled(self._row, not self.enabled)
+
+    def set_weight(self, weight: float):
+        self._genome._set_connection_weight(self._row, weight)
+
+    def set_enabled(self, enabled: bool):
+        if enabled != self.enabled:
+            self._genome._set_connection_enabled(self._row, enabled)
+
+    def copy(self) -> ConnectionGene:
+        return ConnectionGene(
+            from_node=self.from_node,
+            to_node=self.to_node,
+            weight=self.weight,
+            enabled=self.enabled,
+            innovation=self.innovation_number,
+        )
+
+    def __eq__(self, __o: object) -> bool:
+        if isinstance(__o, (ConnectionView, ConnectionGene)):
+            return self.innovation_number == __o.innovation_number
+        return False
+
+    def __hash__(self) -> int:
+        return self.innovation_number
+
+    def __str__(self) -> str:
+        return f"{self.innovation_number}:{str(self.from_node)}{'=>' if self.enabled else '->'}{str(self.to_node)}"
+
+
+class GeneColumns:
+    """
+    Gene arrays owned by a single ArrayGenome
+    """
+    # Changes made to the genes from outside the genome, always 0 for genes no one else can write to
+    version = 0
+
+    def __init__(self) -> None:
+        self.node_ids = np.zeros(0, dtype=np.int64)
+        self.node_types = np.zeros(0, dtype=np.int8)
+        self.node_x_axis = np.zeros(0)
+        self.node_weights = np.zeros(0)
+        self.connection_innovations = np.zeros(0, dtype=np.int64)
+        self.connection_from = np.zeros(0, dtype=np.int64)
+        self.connection_to = np.zeros(0, dtype=np.int64)
+        self.connection_weights = np.zeros(0)
+        self.connection_enabled = np.zeros(0, dtype=bool)
+
+    def append_node(self, innovation_number: int, node_type: int, x_axis: float, weight: float):
+        self.node_ids = np.append(self.node_ids, innovation_number)
+        self.node_types = np.append(self.node_types, np.int8(node_type))
+        self.node_x_axis = np.append(self.node_x_axis, x_axis)
+        self.node_weights = np.append(self.node_weights, weight)
+
+    def append_connection(self, innovation_number: int, from_node: int, to_node: int, weight: float, enabled: bool):
+        self.connection_innovations = np.append(self.connection_innovations, innovation_number)
+        self.connection_from = np.append(self.connection_from, from_node)
+        self.connection_to = np.append(self.connection_to, to_node)
+        self.connection_weights = np.append(self.connection_weights, weight)
+        self.connection_enabled = np.append(self.connection_enabled, enabled)
+
+    def keep(self, node_mask: np.ndarray, connection_mask: np.ndarray):
+        self.node_ids = self.node_ids[node_mask]
+        self.node_types = self.node_types[node_mask]
+        self.node_x_axis = self.node_x_axis[node_mask]
+        self.node_weights = self.node_weights[node_mask]
+        self.connection_innovations = self.connection_innovations[connection_mask]
+        self.connection_from = self.connection_from[connection_mask]
+        self.connection_to = self.connection_to[connection_mask]
+        self.connection_weights = self.connection_weights[connection_mask]
+        self.connection_enabled = self.connection_enabled[connection_mask]
+
+    def copy(self) -> 'GeneColumns':
+        genes = GeneColumns()
+        genes.node_ids = self.node_ids.copy()
+        genes.node_types = self.node_types.copy()
+        genes.node_x_axis = self.node_x_axis.copy()
+        genes.node_weights = self.node_weights.copy()
+        genes.connection_innovations = self.connection_innovations.copy()
+        genes.connection_from = self.connection_from.copy()
+        genes.connection_to = self.connection_to.copy()
+        genes.connection_weights = self.connection_weights.copy()
+        genes.connection_enabled = self.connection_enabled.copy()
+        return genes
+
+
+class ArrayGenome:
+    """
+    Genome backend storing its genes as parallel numpy arrays instead of gene objects.
+    Nodes are rows of (id, type, x_axis, weight), connections rows of (innovation, from, to, weight, enabled).
+    It has the interface of Genome, node_genes and connection_genes return views over the rows.
+    Copying is one ndarray.copy per column.
+    The arrays are a GeneColumns of the genome's own, or a block of a PopulationArena shared by the population.
+    """
+    __registry: InnovationRegistry
+    __genes: GeneColumns
+    __node_rows: Dict[int, int]
+    __connection_rows: Dict[int, int]
+    __network: Optional[FeedForwardNetwork]
+    __version: int
+    __network_version: int
+    __fingerprint: Optional[bytes]
+    __fingerprint_version: int
+    __gene_arrays: Optional[Tuple[np.ndarray, np.ndarray]]
+    __gene_arrays_version: int
+
+    def __init__(self, registry: Optional[InnovationRegistry] = None, arena: Optional[Any] = None) -> None:
+        """
+        @param arena: PopulationArena to store the genes in, the genome owns its arrays when None
+        """
+        self.__registry = registry if registry is not None else DEFAULT_REGISTRY
+        self.__genes = arena.create_genes() if arena is not None else GeneColumns()
+        # node id -> node row, connection innovation -> connection row
+        self.__node_rows = {}
+        self.__connection_rows = {}
+        self.__network = None
+        self.__version = 0
+        self.__network_version = -1
+        self.__fingerprint = None
+        self.__fingerprint_version = -1
+        self.__gene_arrays = None
+        self.__gene_arrays_version = -1
+
+    @property
+    def registry(self) -> InnovationRegistry:
+        return self.__registry
+
+    @property
+    def version(self) -> int:
+        """
+        Incremented on every change to the genes of the genome
+        """
+        return self.__version + self.__genes.version
+
+    @property
+    def genes(self) -> GeneColumns:
+        return self.__genes
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        return self.__genes.node_ids
+
+    @property
+    def node_types(self) -> np.ndarray:
+        return self.__genes.node_types
+
+    @property
+    def node_x_axis(self) -> np.ndarray:
+        return self.__genes.node_x_axis
+
+    @property
+    def node_weights(self) -> np.ndarray:
+        return self.__genes.node_weights
+
+    @property
+    def connection_innovations(self) -> np.ndarray:
+        return self.__genes.connection_innovations
+
+    @property
+    def connection_from(self) -> np.ndarray:
+        return self.__genes.connection_from
+
+    @property
+    def connection_to(self) -> np.ndarray:
+        return self.__genes.connection_to
+
+    @property
+    def connection_weights(self) -> np.ndarray:
+        return self.__genes.connection_weights
+
+    @property
+    def connection_enabled(self) -> np.ndarray:
+        return self.__genes.connection_enabled
+
+    def __structure_changed(self):
+        self.__version += 1
+
+    def _set_connection_weight(self, row: int, weight: float):
+        is_network_current = self.__network is not None and self.__network_version == self.version
+        self.__genes.connection_weights[row] = weight
+        self.__version += 1
+        if not is_network_current:
+            return
+        # Weight only change, patch the compiled network instead of recompiling it
+        self.__network.set_weight(int(self.__genes.connection_from[row]), int(self.__genes.connection_to[row]), float(weight))
+        self.__network_version = self.version
+
+    def set_connection_weights(self, weights: np.ndarray):
+        """
+        Set the weight of every connection row at once
+        """
+        is_network_current = self.__network is not None and self.__network_version == self.version
+        changed = np.flatnonzero(self.__genes.connection_weights != weights)
+        if not len(changed):
+            return
+        self.__genes.connection_weights[changed] = weights[changed]
+        self.__version += 1
+        if not is_network_current:
+            return
+        for from_node, to_node, weight in zip(
+                self.__genes.connection_from[changed].tolist(), self.__genes.connection_to[changed].tolist(), weights[changed].tolist()):
+            self.__network.set_weight(from_node, to_node, weight)
+        self.__network_version = self.version
+
+    def _set_connection_enabled(self, row: int, enabled: bool):
+        self.__genes.connection_enabled[row] = enabled
+        self.__structure_changed()
+
+    @property
+    def fingerprint(self) -> bytes:
+        """
+        Hash of the structure and weights of the genome, equal for genomes that compute the same network
+        """
+        if self.__fingerprint is None or self.__fingerprint_version != self.version:
+            nodes = sorted(zip(self.__genes.node_ids.tolist(), self.__genes.node_types.tolist(), self.__genes.node_x_axis.tolist()))
+            connections = sorted(zip(
+                self.__genes.connection_from.tolist(),
+                self.__genes.connection_to.tolist(),
+                self.__genes.connection_weights.tolist(),
+                self.__genes.connection_enabled.tolist(),
+            ))
+            self.__fingerprint = hashlib.blake2b(repr((nodes, connections)).encode('utf-8'), digest_size=16).digest()
+            self.__fingerprint_version = self.version
+        return self.__fingerprint
+
+    @property
+    def gene_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Integer innovation numbers of the connection genes in increasing order and their aligned weights
+        """
+        if self.__gene_arrays is None or self.__gene_arrays_version != self.version:
+            order = np.argsort(self.__genes.connection_innovations)
+            self.__gene_arrays = (self.__genes.connection_innovations[order], self.__genes.connection_weights[order])
+            self.__gene_arrays_version = self.version
+        return self.__gene_arrays
+
+    @property
+    def hidden_node_count(self):
+        return int(np.count_nonzero(self.__genes.node_types == NodeType.HIDDEN))
+
+    def __index_rows(self):
+        self.__node_rows = {node: row for row, node in enumerate(self.__genes.node_ids.tolist())}
+        self.__connection_rows = {innovation: row for row, innovation in enumerate(self.__genes.connection_innovations.tolist())}
+
+    def __keep_rows(self, keep_nodes: np.ndarray, keep_connections: np.ndarray):
+        self.__genes.keep(keep_nodes, keep_connections)
+        self.__index_rows()
+
+    @staticmethod
+    def from_genes(genes: GeneColumns, registry: Optional[InnovationRegistry] = None) -> 'ArrayGenome':
+        """
+        Genome over already filled gene arrays, e.g. loaded from a PopulationArena
+        """
+        genome = ArrayGenome(registry)
+        genome.__genes = genes
+        genome.__index_rows()
+        if len(genes.node_ids):
+            genome.__registry.reserve_node(int(genes.node_ids.max()))
+        return genome
+
+    def remove_useless_leafs(self):
+        """
+        Remove hidden nodes that no output can be reached from, with their connections
+        """
+        reached = self.__genes.node_types == NodeType.OUTPUT
+        frontier = reached
+        while True:
+            sources = self.__genes.connection_from[np.isin(self.__genes.connection_to, self.__genes.node_ids[frontier])]
+            frontier = np.isin(self.__genes.node_ids, sources) & ~reached
+            if not frontier.any():
+                break
+            reached = reached | frontier
+        keep_nodes = reached | (self.__genes.node_types != NodeType.HIDDEN)
+        if keep_nodes.all():
+            return
+        removed = self.__genes.node_ids[~keep_nodes]
+        keep_connections = ~(np.isin(self.__genes.connection_from, removed) | np.isin(self.__genes.connection_to, removed))
+        self.__keep_rows(keep_nodes, keep_connections)
+        self.__structure_changed()
+
+    def _new_node_innovation(self) -> int:
+        return self.__registry.new_node()
+
+    def get_node(self, innovation_number: int) -> Optional[NodeView]:
+        row = self.__node_rows.get(innovation_number, None)
+        return NodeView(self, row) if row is not None else None
+
+    def __append_node(self, innovation_number: int, node_type: NodeType, x_axis: float, weight: float):
+        self.__node_rows[innovation_number] = len(self.__genes.node_ids)
+        self.__genes.append_node(innovation_number, node_type, x_axis, weight)
+
+    def add_node(self, node: Union[NodeGene, NodeView]):
+        row = self.__node_rows.get(node.innovation_number, None)
+        if row is None:
+            self.__append_node(node.innovation_number, node.node_type, node.x_axis, node.weight)
+        else:
+            self.__genes.node_types[row] = node.node_type
+            self.__genes.node_x_axis[row] = node.x_axis
+            self.__genes.node_weights[row] = node.weight
+        self.__registry.reserve_node(node.innovation_number)
+        self.__structure_changed()
+
+    def get_connection(self, innovation_number: int) -> Optional[ConnectionView]:
+        row = self.__connection_rows.get(innovation_number, None)
+        return ConnectionView(self, row) if row is not None else None
+
+    @property
+    def network(self) -> FeedForwardNetwork:
+        """
+        Execution plan of the genome, compiled on first use and kept until the genome changes
+        """
+        if self.__network is None or self.__network_version != self.version:
+            self.__network = FeedForwardNetwork.from_arrays(
+                self.__genes.node_ids,
+                self.__genes.node_types,
+                self.__genes.node_x_axis,
+                self.__genes.connection_from,
+                self.__genes.connection_to,
+                self.__genes.connection_weights,
+                self.__genes.connection_enabled,
+            )
+            self.__network_version = self.version
+        return self.__network
+
+    def calculate_result(self, *args: float):
+        network = self.network
+        if len(network.input_slots) != len(args):
+            raise ValueError(
+                "Number of input nodes does not match number of arguments")
+        return network.activate(*args)
+
+    def compile_function(self) -> Callable[..., List[float]]:
+        """
+        Generate and compile straight line python for the current genes, see Genome.compile_function
+        """
+        return self.network.compile_function()
+
+    def calculate_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Evaluate an (n_tests x n_inputs) matrix of inputs in one pass
+        @returns (n_tests x n_outputs) matrix of outputs
+        """
+        return self.network.activate_batch(inputs)
+
+    def connection_mutation(self, nodes: Optional[Tuple[Union[NodeGene, NodeView], Union[NodeGene, NodeView]]] = None):
+        """
+        Add a connection between 2 nodes
+        """
+        if isinstance(nodes, tuple) and len(nodes) == 2:
+            rows = [self.__node_rows.get(node.innovation_number, None) for node in nodes]
+            if None in rows:
+                raise ValueError(
+                    "Connection Mutation Failed, One or more nodes are not in the genome")
+            row_from, row_to = rows
+        else:
+            # Every (from, to) row pair with from left of to that is not connected yet
+            x_axis = self.__genes.node_x_axis
+            feasible = x_axis[:, None] < x_axis[None, :]
+            feasible[
+                [self.__node_rows[node] for node in self.__genes.connection_from.tolist()],
+                [self.__node_rows[node] for node in self.__genes.connection_to.tolist()],
+            ] = False
+            candidates = np.flatnonzero(feasible)
+            if not len(candidates):
+                # Every valid pair of nodes is connected already
+                return
+            row_from, row_to = divmod(int(random.choice(candidates)), len(x_axis))
+
+        if self.__genes.node_x_axis[row_from] == self.__genes.node_x_axis[row_to]:
+            return
+        if self.__genes.node_x_axis[row_from] > self.__genes.node_x_axis[row_to]:
+            row_from, row_to = row_to, row_from
+
+        from_node = int(self.__genes.node_ids[row_from])
+        to_node = int(self.__genes.node_ids[row_to])
+        if self.__registry.connection_innovation(from_node, to_node) in self.__connection_rows:
+            return
+        self.create_connection(from_node, to_node)
+
+    def node_mutation(self, connection_to_break: Optional[Union[ConnectionGene, ConnectionView]] = None):
+        """
+        Break a connection into two, adding a node in between
+        """
+        if connection_to_break is None:
+            if not len(self.__genes.connection_innovations):
+                return
+            row = random.randrange(len(self.__genes.connection_innovations))
+        else:
+            row = self.__connection_rows.get(connection_to_break.innovation_number, None)
+            if row is None:
+                raise ValueError(
+                    "Node Mutation Failed, Connection is not in the genome")
+
+        node_a = int(self.__genes.connection_from[row])
+        node_b = int(self.__genes.connection_to[row])
+        weight = float(self.__genes.connection_weights[row])
+        middle_x = (self.__genes.node_x_axis[self.__node_rows[node_a]] + self.__genes.node_x_axis[self.__node_rows[node_b]]) / 2
+        # Same split in the same generation, same node. Unless this genome already split the connection before
+        innovation_number = self.__registry.split_node(node_a, node_b)
+        if innovation_number in self.__node_rows:
+            innovation_number = self.__registry.new_node()
+        self.__append_node(innovation_number, NodeType.HIDDEN, float(middle_x), random.random())
+        self.__registry.reserve_node(innovation_number)
+        self.__structure_changed()
+
+        if self.__genes.connection_enabled[row]:
+            self._set_connection_enabled(row, False)
+
+        self.create_connection(node_a, innovation_number, weight=1.0)
+        self.create_connection(innovation_number, node_b, weight=weight)
+
+    def weight_mutation(self):
+        if not len(self.__genes.connection_innovations):
+            return
+        row = random.randrange(len(self.__genes.connection_innovations))
+        self._set_connection_weight(row, mutated_weight(float(self.__genes.connection_weights[row])))
+
+    def create_connection(self, from_node: int, to_node: int, weight: Optional[float] = None, enabled: bool = True):
+        row_from = self.__node_rows.get(from_node, None)
+        row_to = self.__node_rows.get(to_node, None)
+        if row_from is None or row_to is None:
+            raise ValueError("One or more nodes are not in the genome")
+        if self.__genes.node_x_axis[row_from] >= self.__genes.node_x_axis[row_to]:
+            raise ValueError(
+                "Cannot create connection, from_node must be on the left of to_node")
+        innovation_number = self.__registry.connection_innovation(from_node, to_node)
+        row = self.__connection_rows.get(innovation_number, None)
+        if row is None:
+            self.__connection_rows[innovation_number] = len(self.__genes.connection_innovations)
+            self.__genes.append_connection(
+                innovation_number, from_node, to_node, weight if weight is not None else random.random(), bool(enabled))
+        else:
+            if weight is not None:
+                self.__genes.connection_weights[row] = weight
+            if isinstance(enabled, bool):
+                self.__genes.connection_enabled[row] = enabled
+        self.__structure_changed()
+
+    def mutate(self, weights: bool = True):
+        event = random.random()
+        sorted_actions = sorted([
+            (PROBABILITY_NODE_MUTATION, self.node_mutation),
+            (PROBABILITY_CONNECTION_MUTATION, self.connection_mutation),
+            (PROBABILITY_WEIGHT_MUTATION, self.weight_mutation),
+        ], key=lambda x: x[0])
+        for event_threshold, action in sorted_actions:
+            if event < event_threshold:
+                if weights or action != self.weight_mutation:
+                    action()
+                break
+
+    @property
+    def node_genes(self) -> List[NodeView]:
+        return [NodeView(self, row) for row in range(len(self.__genes.node_ids))]
+
+    @property
+    def connection_genes(self) -> List[ConnectionView]:
+        return [ConnectionView(self, row) for row in range(len(self.__genes.connection_innovations))]
+
+    distance = staticmethod(Genome.distance)
+
+    @staticmethod
+    def crossover(genome_a: 'ArrayGenome', genome_b: 'ArrayGenome', equal_fitness: bool = False) -> 'ArrayGenome':
+        """
+        Crossover two genomes, genes are aligned by innovation number
+        @param genome_a: More Fit genome
+        @param genome_b: Less Fit genome
+        """
+        return ArrayGenome.crossover_many([(genome_a, genome_b)])[0]
+
+    @staticmethod
+    def crossover_many(pairs: List[Tuple['ArrayGenome', 'ArrayGenome']]) -> List['ArrayGenome']:
+        """
+        Crossover of every (more fit, less fit) pair, in order, the random draws of every pair come from one
+        generator seeded from the python random state
+        """
+        matches = [
+            np.intersect1d(genome_a.__genes.connection_innovations, genome_b.__genes.connection_innovations, assume_unique=True, return_indices=True)[1:]
+            for genome_a, genome_b in pairs
+        ]
+        # Parent choice and disabling draw of every matching gene of every pair at once
+        offsets = np.cumsum([len(rows_a) for rows_a, _ in matches])
+        draws = np.random.default_rng(random.getrandbits(64)).random((2, int(offsets[-1]) if len(offsets) else 0))
+        return [
+            ArrayGenome.__crossover(genome_a, genome_b, rows_a, rows_b, pair_draws)
+            for (genome_a, genome_b), (rows_a, rows_b), pair_draws in zip(pairs, matches, np.split(draws, offsets[:-1], axis=1))
+        ]
+
+    @staticmethod
+    def __crossover(genome_a: 'ArrayGenome', genome_b: 'ArrayGenome', rows_a: np.ndarray, rows_b: np.ndarray, draws: np.ndarray) -> 'ArrayGenome':
+        # Disjoint and excess genes come from the fitter parent, so the child has its structure
+        child_genome = genome_a.copy()
+        if not len(rows_a):
+            return child_genome
+
+        # Matching genes take the weight of a random parent
+        from_parent_b = draws[0] < 0.5
+        child_genome.__genes.connection_weights[rows_a] = np.where(
+            from_parent_b, genome_b.__genes.connection_weights[rows_b], genome_a.__genes.connection_weights[rows_a])
+        # Disabled in either parent, the child gene is disabled with PROBABILITY_CROSSOVER_CONNECTION_DISABLED
+        is_disabled = ~(genome_a.__genes.connection_enabled[rows_a] & genome_b.__genes.connection_enabled[rows_b])
+        child_genome.__genes.connection_enabled[rows_a] = ~(is_disabled & (draws[1] < PROBABILITY_CROSSOVER_CONNECTION_DISABLED))
+        child_genome.__structure_changed()
+        return child_genome
+
+    def __str__(self) -> str:
+        out = ""
+        for connection in self.connection_genes:
+            message = str(connection)
+            if out != "":
+                out += " "
+            out += f'{message:{" "}{"<"}{8}}'
+            out += "|"
+        return out
+
+    def copy(self) -> 'ArrayGenome':
+        genome = ArrayGenome(self.__registry)
+        genome.__genes = self.__genes.copy()
+        genome.__node_rows = self.__node_rows.copy()
+        genome.__connection_rows = self.__connection_rows.copy()
+        if self.__network is not None and self.__network_version == self.version:
+            # Unchanged genes, reuse the compiled network
+            genome.__network = self.__network.copy()
+            genome.__network_version = genome.version
+        if self.__fingerprint is not None and self.__fingerprint_version == self.version:
+            genome.__fingerprint = self.__fingerprint
+            genome.__fingerprint_version = genome.version
+        if self.__gene_arrays is not None and self.__gene_arrays_version == self.version:
+            genome.__gene_arrays = self.__gene_arrays
+            genome.__gene_arrays_version = genome.version
+        return genome
@@ -1,16 +1,35 @@
 from typing import Optional
 from config import PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT, WEIGHT_RANDOM_STRENGTH, WEIGHT_SHIFT_STRENGTH
 from src.gene import Gene
+from src.gene_store import DEFAULT_REGISTRY
 import random
 
 
+def mutated_weight(weight: float) -> float:
+    """
+    Weight after a random reassignment or shift, clipped to [-1, 1]
+    """
+    event = random.random()
+    sign = random.choice([-1, 1])
+    if PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT > event:
+        weight = (random.random() * sign) * WEIGHT_RANDOM_STRENGTH
+    else:
+        weight += (random.random() * sign) * WEIGHT_SHIFT_STRENGTH
+    if weight < -1:
+        weight = -1
+    elif weight > 1:
+        weight = 1
+    return weight
+
+
 class ConnectionGene(Gene):
+    __slots__ = ('from_node', 'to_node', '_enabled')
+
     from_node: int
     to_node: int
-    __enabled: bool
-    _INNOVATION_NUMBER: str
+    _enabled: bool
 
-    def __init__(self, from_node: int, to_node: int, weight: Optional[float] = None, enabled: bool = True) -> None:
+    def __init__(self, from_node: int, to_node: int, weight: Optional[float] = None, enabled: bool = True, innovation: Optional[int] = None) -> None:
         super().__init__()
         self.from_node = from_node
         self.to_node = to_node
@@ -23,52 +42,44 @@ class ConnectionGene(Gene):
         self._weight = weight
         if not isinstance(enabled, bool):
             enabled = False
-        self.__enabled = enabled
+        self._enabled = enabled
+        if innovation is None:
+            # Genes are normally created by a genome, which passes the innovation of its own registry
+            innovation = DEFAULT_REGISTRY.connection_innovation(from_node, to_node)
+        self._innovation_number = innovation
     
     @property
     def enabled(self):
-        return self.__enabled
-    
-    @property
-    def innovation_number(self):
-        return f"{self.from_node}->{self.to_node}"
+        return self._enabled
 
     def mutate_enabled(self):
-        self.__enabled = not self.__enabled
+        self._enabled = not self._enabled
 
     def mutate_weight(self):
-        event = random.random()
-        sign = random.choice([-1, 1])
-        if PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT > event:
-            self._weight = (random.random() * sign) * WEIGHT_RANDOM_STRENGTH
-        else:
-            self._weight += (random.random() * sign) * WEIGHT_SHIFT_STRENGTH
-        if self.weight < -1:
-            self._weight = -1
-        elif self.weight > 1:
-            self._weight = 1
+        self._weight = mutated_weight(self._weight)
 
     def copy(self) -> 'ConnectionGene':
         return ConnectionGene(
             from_node=self.from_node,
             to_node=self.to_node,
             weight=self._weight,
-            enabled=self.__enabled
+            enabled=self._enabled,
+            innovation=self._innovation_number,
         )
     
     def set_weight(self, weight: float):
         self._weight = weight
     
     def set_enabled(self, enabled: bool):
-        self.__enabled = enabled
+        self._enabled = enabled
     
     def __eq__(self, __o: object) -> bool:
         if isinstance(__o, ConnectionGene):
-            return self.innovation_number == __o.innovation_number
+            return self._innovation_number == __o._innovation_number
         return False
     
     def __hash__(self) -> int:
-        return self.innovation_number
+        return self._innovation_number
     
     def __str__(self) -> str:
         return f"{self.innovation_number}:{str(self.from_node)}{'=>' if self.enabled else '->'}{str(self.to_node)}"
\ No newline at end of file
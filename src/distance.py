@@ -0,0 +1,104 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from config import DISTANCE_AVG_WEIGHT_DIFF_IMPORTANCE, DISTANCE_DISJOINT_GENES_IMPORTANCE, DISTANCE_EXCESS_GENES_IMPORTANCE
+
+from src.genome import Genome
+from src.population_arena import arena_slots, shared_arena
+
+
+class _EncodedGenomes:
+    """
+    Genomes encoded against a shared, sorted innovation column space
+    The column indices of every genome are kept flat, the dense presence/weight rows are only built for one block at a time
+    """
+
+    def __init__(self, innovations: np.ndarray, weights: np.ndarray, gene_counts: np.ndarray, columns: np.ndarray) -> None:
+        self.columns = np.searchsorted(columns, innovations)
+        self.weights = weights
+        self.gene_counts = gene_counts
+        self.starts = np.zeros(len(gene_counts) + 1, dtype=np.int64)
+        np.cumsum(gene_counts, out=self.starts[1:])
+        # Column of the last innovation, -1 for genomes without connections
+        self.last_columns = np.full(len(gene_counts), -1, dtype=np.int64)
+        has_genes = self.gene_counts > 0
+        if np.any(has_genes):
+            self.last_columns[has_genes] = np.maximum.reduceat(self.columns, self.starts[:-1][has_genes])
+
+    def dense(self, start: int, end: int, column_count: int) -> Tuple[np.ndarray, np.ndarray]:
+        presence = np.zeros((end - start, column_count), dtype=bool)
+        weights = np.zeros((end - start, column_count))
+        genes = slice(self.starts[start], self.starts[end])
+        rows = np.repeat(np.arange(end - start), self.gene_counts[start:end])
+        presence[rows, self.columns[genes]] = True
+        weights[rows, self.columns[genes]] = self.weights[genes]
+        return presence, weights
+
+
+def _flat_genes(genomes: Sequence[Genome]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Innovations and weights of the connection genes of every genome, concatenated, and the gene count of every genome
+    Genomes of one PopulationArena are read from its columns at once
+    """
+    arena = shared_arena(genomes)
+    if arena is not None:
+        rows, positions = arena.connection_rows(arena_slots(genomes))
+        return arena.column('connection_innovations')[rows], arena.connection_weights[rows], np.bincount(positions, minlength=len(genomes))
+    gene_arrays = [genome.gene_arrays for genome in genomes]
+    return (
+        np.concatenate([np.zeros(0, dtype=np.int64)] + [innovations for innovations, _ in gene_arrays]),
+        np.concatenate([np.zeros(0)] + [weights for _, weights in gene_arrays]),
+        np.array([len(innovations) for innovations, _ in gene_arrays], dtype=np.int64),
+    )
+
+
+def population_distance_matrix(genomes: Sequence[Genome], representatives: Optional[Sequence[Genome]] = None, block_size: int = 1 << 22) -> np.ndarray:
+    """
+    Genome.distance of every genome to every representative, computed in blocks of genomes
+    @param representatives: Genomes to measure against, the population itself when None
+    @param block_size: Upper bound of the number of floats in the temporary (genomes x representatives x innovations) blocks
+    @returns (len(genomes) x len(representatives)) matrix
+    """
+    if representatives is None:
+        representatives = genomes
+    result = np.zeros((len(genomes), len(representatives)))
+    if not len(genomes) or not len(representatives):
+        return result
+
+    genes = _flat_genes(genomes)
+    representative_genes = _flat_genes(representatives)
+    columns = np.unique(np.concatenate([genes[0], representative_genes[0]]))
+    column_count = len(columns)
+    encoded = _EncodedGenomes(*genes, columns)
+    encoded_representatives = _EncodedGenomes(*representative_genes, columns)
+
+    representative_presence, representative_weights = encoded_representatives.dense(0, len(representatives), column_count)
+    # Genes of every representative up to (and including) each column, shifted by one so that column -1 reads 0
+    representative_cumulative = np.zeros((len(representatives), column_count + 1), dtype=np.int64)
+    np.cumsum(representative_presence, axis=1, out=representative_cumulative[:, 1:])
+    representative_counts = encoded_representatives.gene_counts
+    representative_last = encoded_representatives.last_columns
+
+    rows_per_block = max(1, block_size // max(1, len(representatives) * column_count))
+    for start in range(0, len(genomes), rows_per_block):
+        end = min(start + rows_per_block, len(genomes))
+        presence, weights = encoded.dense(start, end, column_count)
+        counts = encoded.gene_counts[start:end]
+        last = encoded.last_columns[start:end]
+
+        matching = presence.astype(float) @ representative_presence.T.astype(float)
+        both = presence[:, None, :] & representative_presence[None, :, :]
+        weight_difference = np.where(both, np.abs(weights[:, None, :] - representative_weights[None, :, :]), 0.0).sum(axis=2)
+
+        cumulative = np.zeros((end - start, column_count + 1), dtype=np.int64)
+        np.cumsum(presence, axis=1, out=cumulative[:, 1:])
+        excess = (counts[:, None] - cumulative[:, representative_last + 1]) + \
+            (representative_counts[None, :] - representative_cumulative[:, last + 1].T)
+        disjoint = counts[:, None] + representative_counts[None, :] - 2 * matching - excess
+
+        larger = np.maximum(counts[:, None], representative_counts[None, :]).astype(float)
+        average_weight_difference = np.divide(weight_difference, matching, out=np.zeros_like(weight_difference), where=matching > 0)
+        distance = (DISTANCE_EXCESS_GENES_IMPORTANCE * excess + DISTANCE_DISJOINT_GENES_IMPORTANCE * disjoint) / np.maximum(larger, 1) + \
+            DISTANCE_AVG_WEIGHT_DIFF_IMPORTANCE * average_weight_difference
+        result[start:end] = np.where(larger > 0, distance, 0.0)
+    return result
@@ -0,0 +1,323 @@
+"""
+Distributed fitness evaluation over TCP.
+
+Neat.run serves evaluation tasks through a Coordinator when NeatConfig.coordinator is set,
+workers connect to it with the neatpy-worker entry point:
+
+    python -m src.distributed <host> <port> --neat tests.xor:XorNeat
+
+Messages are length prefixed json. A generation is sent to a worker once as a job (Neat subclass,
+config and test inputs), its tasks then only carry compiled networks and hidden node counts.
+Workers send heartbeats while connected, tasks of a worker that disconnects or misses its
+heartbeats are queued again for the other workers. Coordinator.evaluate raises TimeoutError when
+no worker is connected for timeout seconds, Neat then evaluates the generation locally.
+"""
+import argparse
+import importlib
+import json
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, replace
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.feed_forward import FeedForwardNetwork
+
+HEADER = struct.Struct('!I')
+POLL_INTERVAL = 0.05
+
+NEAT_REGISTRY: Dict[str, type] = {}
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]):
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock: socket.socket) -> Dict[str, Any]:
+    size, = HEADER.unpack(_receive_exactly(sock, HEADER.size))
+    return json.loads(_receive_exactly(sock, size).decode('utf-8'))
+
+
+def neat_path(neat_class: type) -> str:
+    return f"{neat_class.__module__}:{neat_class.__qualname__}"
+
+
+def register_neat(neat_class: type) -> type:
+    """
+    Make a Neat subclass resolvable by workers, can be used as a class decorator
+    """
+    NEAT_REGISTRY[neat_path(neat_class)] = neat_class
+    NEAT_REGISTRY[neat_class.__qualname__] = neat_class
+    return neat_class
+
+
+def resolve_neat(path: str) -> type:
+    module_name, _, qualname = path.partition(':')
+    if path in NEAT_REGISTRY:
+        return NEAT_REGISTRY[path]
+    if qualname in NEAT_REGISTRY:
+        # Registered under another module, e.g. a class the coordinator defined in __main__
+        return NEAT_REGISTRY[qualname]
+    neat_class: Any = importlib.import_module(module_name)
+    for attribute in qualname.split('.'):
+        neat_class = getattr(neat_class, attribute)
+    return register_neat(neat_class)
+
+
+class _Task:
+    def __init__(self, task_id: int, job_id: int, networks: List[Dict[str, Any]], hidden_nodes: List[int]) -> None:
+        self.task_id = task_id
+        self.job_id = job_id
+        self.networks = networks
+        self.hidden_nodes = hidden_nodes
+        self.result: Optional[List[float]] = None
+
+
+class Coordinator:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, heartbeat_timeout: float = 5.0) -> None:
+        self.heartbeat_timeout = heartbeat_timeout
+        self.__server = socket.create_server((host, port))
+        self.__condition = threading.Condition()
+        self.__pending: Deque[_Task] = deque()
+        self.__jobs: Dict[int, Dict[str, Any]] = {}
+        self.__next_id = 0
+        self.__workers = 0
+        self.__closed = False
+        self.__accept_thread = threading.Thread(target=self.__accept, daemon=True)
+        self.__accept_thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.__server.getsockname()[:2]
+
+    @property
+    def worker_count(self) -> int:
+        return self.__workers
+
+    def evaluate(self, neat_class: type, config: Any, networks: Sequence[FeedForwardNetwork], hidden_nodes: Sequence[int], test_input: List[List[float]], chunk_size: int = 64, timeout: Optional[float] = None) -> List[float]:
+        """
+        Average fitness of every network, blocks until connected workers have evaluated all of them
+        @param timeout: Seconds without any connected worker before giving up with a TimeoutError, None waits forever
+        """
+        with self.__condition:
+            self.__next_id += 1
+            job_id = self.__next_id
+            self.__jobs[job_id] = {
+                'type': 'job',
+                'job': job_id,
+                'neat': neat_path(neat_class),
+                'config': asdict(config),
+                'test_input': test_input,
+            }
+            tasks: List[_Task] = []
+            for i in range(0, len(networks), chunk_size):
+                self.__next_id += 1
+                tasks.append(_Task(
+                    self.__next_id,
+                    job_id,
+                    [network.to_dict() for network in networks[i:i + chunk_size]],
+                    list(hidden_nodes[i:i + chunk_size]),
+                ))
+            self.__pending.extend(tasks)
+            self.__condition.notify_all()
+            deadline: Optional[float] = None
+            while not self.__closed and any(task.result is None for task in tasks):
+                if timeout is None or self.__workers:
+                    deadline = None
+                    self.__condition.wait()
+                    continue
+                # Nobody to evaluate the tasks, the clock runs until a worker connects
+                if deadline is None:
+                    deadline = time.monotonic() + timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.__pending = deque(task for task in self.__pending if task.job_id != job_id)
+                    self.__jobs.pop(job_id)
+                    raise TimeoutError(f"No worker connected for {timeout} seconds")
+                self.__condition.wait(remaining)
+            self.__jobs.pop(job_id)
+            if self.__closed:
+                raise ConnectionError("Coordinator closed")
+        return [fitness for task in tasks for fitness in task.result]
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__server.close()
+
+    def __enter__(self) -> 'Coordinator':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __accept(self):
+        while not self.__closed:
+            try:
+                sock, _ = self.__server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.__serve_worker, args=(sock,), daemon=True).start()
+
+    def __take_task(self) -> Optional[_Task]:
+        with self.__condition:
+            if not self.__pending and not self.__closed:
+                self.__condition.wait(POLL_INTERVAL)
+            return self.__pending.popleft() if self.__pending else None
+
+    def __serve_worker(self, sock: socket.socket):
+        sock.settimeout(self.heartbeat_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.__condition:
+            self.__workers += 1
+            self.__condition.notify_all()
+        worker_job: Optional[int] = None
+        in_flight: Optional[_Task] = None
+        last_seen = time.monotonic()
+        try:
+            while not self.__closed:
+                if in_flight is None:
+                    in_flight = self.__take_task()
+                    if in_flight is not None:
+                        if worker_job != in_flight.job_id:
+                            send_message(sock, self.__jobs[in_flight.job_id])
+                            worker_job = in_flight.job_id
+                        send_message(sock, {
+                            'type': 'task',
+                            'task': in_flight.task_id,
+                            'networks': in_flight.networks,
+                            'hidden_nodes': in_flight.hidden_nodes,
+                        })
+                readable, _, _ = select.select([sock], [], [], POLL_INTERVAL if in_flight is not None else 0)
+                if not readable:
+                    if time.monotonic() - last_seen > self.heartbeat_timeout:
+                        raise TimeoutError("Worker missed its heartbeats")
+                    continue
+                message = receive_message(sock)
+                last_seen = time.monotonic()
+                if message['type'] == 'result' and in_flight is not None and message['task'] == in_flight.task_id:
+                    with self.__condition:
+                        in_flight.result = message['fitness']
+                        self.__condition.notify_all()
+                    in_flight = None
+            send_message(sock, {'type': 'shutdown'})
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            with self.__condition:
+                self.__workers -= 1
+                if in_flight is not None and in_flight.result is None:
+                    # Lost worker, hand its task to the next free one
+                    self.__pending.appendleft(in_flight)
+                self.__condition.notify_all()
+            sock.close()
+
+
+class Worker:
+    def __init__(self, host: str, port: int, heartbeat_interval: float = 1.0, connect_timeout: float = 30.0) -> None:
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.connect_timeout = connect_timeout
+        self.__stopped = threading.Event()
+        self.__send_lock = threading.Lock()
+        self.__neats: Dict[str, Any] = {}
+
+    def stop(self):
+        self.__stopped.set()
+
+    def __send(self, sock: socket.socket, message: Dict[str, Any]):
+        with self.__send_lock:
+            send_message(sock, message)
+
+    def __heartbeat(self, sock: socket.socket):
+        while not self.__stopped.wait(self.heartbeat_interval):
+            try:
+                self.__send(sock, {'type': 'heartbeat'})
+            except OSError:
+                return
+
+    def __neat(self, job: Dict[str, Any]):
+        from src.neat import NeatConfig
+
+        key = json.dumps([job['neat'], job['config']], sort_keys=True)
+        if key not in self.__neats:
+            config = NeatConfig(**job['config'])
+            # Workers only need the fitness function, not a population of their own
+            config = replace(config, population_size=0, workers=0, coordinator=None)
+            self.__neats[key] = resolve_neat(job['neat'])(config)
+        return self.__neats[key]
+
+    def __connect(self) -> socket.socket:
+        # Workers may be started before the coordinator is listening
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return socket.create_connection((self.host, self.port))
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(POLL_INTERVAL)
+
+    def run(self):
+        """
+        Serve tasks until the coordinator shuts down or the connection is lost
+        """
+        sock = self.__connect()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        heartbeat = threading.Thread(target=self.__heartbeat, args=(sock,), daemon=True)
+        heartbeat.start()
+        job: Optional[Dict[str, Any]] = None
+        try:
+            while not self.__stopped.is_set():
+                message = receive_message(sock)
+                if message['type'] == 'job':
+                    job = message
+                elif message['type'] == 'task':
+                    networks = [FeedForwardNetwork.from_dict(network) for network in message['networks']]
+                    fitness = self.__neat(job).evaluate_networks(networks, message['hidden_nodes'], job['test_input'])
+                    self.__send(sock, {'type': 'result', 'task': message['task'], 'fitness': fitness})
+                elif message['type'] == 'shutdown':
+                    break
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            self.__stopped.set()
+            sock.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    neatpy-worker entry point
+    """
+    parser = argparse.ArgumentParser(prog='neatpy-worker', description='Evaluate genomes for a Neat coordinator')
+    parser.add_argument('host')
+    parser.add_argument('port', type=int)
+    parser.add_argument('--neat', action='append', default=[], help='module:Class of a Neat subclass to register')
+    parser.add_argument('--heartbeat-interval', type=float, default=1.0)
+    parser.add_argument('--connect-timeout', type=float, default=30.0)
+    args = parser.parse_args(argv)
+    for path in args.neat:
+        register_neat(resolve_neat(path))
+    Worker(args.host, args.port, heartbeat_interval=args.heartbeat_interval, connect_timeout=args.connect_timeout).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+import math
+from typing import List, Dict, Optional, Tuple, Callable, Any
+
+import numpy as np
+
+from src.node_gene import NodeGene
+from src.connection_gene import ConnectionGene
+from utils.enums import NodeType
+
+
+class FeedForwardNetwork:
+    """
+    Flat, topologically ordered execution plan compiled from a genome.
+    Every node owns an integer slot, nodes are ordered by x_axis so that every
+    connection points from an earlier slot to a later one, and the enabled
+    incoming connections of each node are stored as a contiguous range of
+    the edge arrays (edge_offsets[i]:edge_offsets[i+1]).
+    Nodes sharing an x_axis form a level, level_bounds[l]:level_bounds[l+1]
+    indexes node_slots of level l.
+    edge_index maps (from_node, to_node) innovations to the edge position so
+    weight changes can be patched in place.
+    """
+
+    def __init__(self, input_slots: List[int], output_slots: List[int], node_slots: List[int], edge_offsets: List[int], edge_sources: List[int], edge_weights: List[float], level_bounds: List[int], slot_count: int, edge_index: Dict[Tuple[int, int], int]) -> None:
+        self.input_slots = input_slots
+        self.output_slots = output_slots
+        self.node_slots = node_slots
+        self.edge_offsets = edge_offsets
+        self.edge_sources = edge_sources
+        self.edge_weights = edge_weights
+        self.level_bounds = level_bounds
+        self.slot_count = slot_count
+        self.edge_index = edge_index
+        self.__arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @staticmethod
+    def create(node_genes: List[NodeGene], connection_genes: List[ConnectionGene]) -> 'FeedForwardNetwork':
+        # Inputs and outputs keep innovation order, which is the order populate_nodes feeds and reads them in
+        ordered_nodes = sorted(node_genes, key=lambda node: (node.x_axis, node.innovation_number))
+        slots: Dict[int, int] = {}
+        for slot, node in enumerate(ordered_nodes):
+            slots[node.innovation_number] = slot
+
+        incoming: Dict[int, List[ConnectionGene]] = {}
+        for connection in connection_genes:
+            if not connection.enabled:
+                continue
+            if connection.from_node not in slots or connection.to_node not in slots:
+                raise ValueError(f"Invalid connection {connection}, node is not in the genome")
+            incoming.setdefault(connection.to_node, []).append(connection)
+
+        input_slots: List[int] = []
+        output_slots: List[int] = []
+        node_slots: List[int] = []
+        edge_offsets: List[int] = [0]
+        edge_sources: List[int] = []
+        edge_weights: List[float] = []
+        edge_index: Dict[Tuple[int, int], int] = {}
+        level_bounds: List[int] = []
+        level_x_axis = None
+        for slot, node in enumerate(ordered_nodes):
+            if node.node_type == NodeType.INPUT:
+                input_slots.append(slot)
+                continue
+            if node.node_type == NodeType.OUTPUT:
+                output_slots.append(slot)
+            if node.x_axis != level_x_axis:
+                level_x_axis = node.x_axis
+                level_bounds.append(len(node_slots))
+            for connection in incoming.get(node.innovation_number, []):
+                edge_index[(connection.from_node, connection.to_node)] = len(edge_sources)
+                edge_sources.append(slots[connection.from_node])
+                edge_weights.append(connection.weight)
+            node_slots.append(slot)
+            edge_offsets.append(len(edge_sources))
+        level_bounds.append(len(node_slots))
+
+        return FeedForwardNetwork(
+            input_slots=input_slots,
+            output_slots=output_slots,
+            node_slots=node_slots,
+            edge_offsets=edge_offsets,
+            edge_sources=edge_sources,
+            edge_weights=edge_weights,
+            level_bounds=level_bounds,
+            slot_count=len(ordered_nodes),
+            edge_index=edge_index,
+        )
+
+    @staticmethod
+    def from_arrays(node_ids: np.ndarray, node_types: np.ndarray, node_x_axis: np.ndarray, connection_from: np.ndarray, connection_to: np.ndarray, connection_weights: np.ndarray, connection_enabled: np.ndarray) -> 'FeedForwardNetwork':
+        """
+        Same plan as create, built from parallel gene arrays
+        """
+        order = np.lexsort((node_ids, node_x_axis))
+        slots = dict(zip(node_ids[order].tolist(), range(len(order))))
+        enabled = np.flatnonzero(connection_enabled)
+        try:
+            sources = np.array([slots[node] for node in connection_from[enabled].tolist()], dtype=np.intp)
+            targets = np.array([slots[node] for node in connection_to[enabled].tolist()], dtype=np.intp)
+        except KeyError as e:
+            raise ValueError(f"Invalid connection, node {e.args[0]} is not in the genome") from e
+
+        ordered_types = node_types[order]
+        is_input = ordered_types == NodeType.INPUT
+        node_slots = np.flatnonzero(~is_input)
+        # Inputs are never evaluated, edges into them are dropped like create does
+        keep = ~is_input[targets]
+        edge_order = np.flatnonzero(keep)[np.argsort(targets[keep], kind='stable')]
+        sorted_targets = targets[edge_order]
+        edge_offsets = np.append(np.searchsorted(sorted_targets, node_slots), len(edge_order))
+
+        level_x_axis = node_x_axis[order][node_slots]
+        level_bounds = [0] + (np.flatnonzero(np.diff(level_x_axis) != 0) + 1).tolist()
+        if len(node_slots):
+            level_bounds.append(len(node_slots))
+
+        edge_from = connection_from[enabled][edge_order].tolist()
+        edge_to = connection_to[enabled][edge_order].tolist()
+        return FeedForwardNetwork(
+            input_slots=np.flatnonzero(is_input).tolist(),
+            output_slots=np.flatnonzero(ordered_types == NodeType.OUTPUT).tolist(),
+            node_slots=node_slots.tolist(),
+            edge_offsets=edge_offsets.tolist(),
+            edge_sources=sources[edge_order].tolist(),
+            edge_weights=connection_weights[enabled][edge_order].tolist(),
+            level_bounds=level_bounds,
+            slot_count=len(order),
+            edge_index={edge: i for i, edge in enumerate(zip(edge_from, edge_to))},
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Compact, json serialisable form of the plan, edge_index is not kept
+        """
+        return {
+            'input_slots': self.input_slots,
+            'output_slots': self.output_slots,
+            'node_slots': self.node_slots,
+            'edge_offsets': self.edge_offsets,
+            'edge_sources': self.edge_sources,
+            'edge_weights': self.edge_weights,
+            'level_bounds': self.level_bounds,
+            'slot_count': self.slot_count,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'FeedForwardNetwork':
+        return FeedForwardNetwork(edge_index={}, **data)
+
+    def copy(self) -> 'FeedForwardNetwork':
+        """
+        Copy sharing the structure, with its own weights
+        """
+        network = FeedForwardNetwork(
+            input_slots=self.input_slots,
+            output_slots=self.output_slots,
+            node_slots=self.node_slots,
+            edge_offsets=self.edge_offsets,
+            edge_sources=self.edge_sources,
+            edge_weights=self.edge_weights.copy(),
+            level_bounds=self.level_bounds,
+            slot_count=self.slot_count,
+            edge_index=self.edge_index,
+        )
+        if self.__arrays is not None:
+            sources, weights, targets = self.__arrays
+            network.__arrays = (sources, weights.copy(), targets)
+        return network
+
+    def set_weight(self, from_node: int, to_node: int, weight: float):
+        """
+        Patch the weight of a connection, connections not in the plan (disabled) are ignored
+        """
+        edge = self.edge_index.get((from_node, to_node), None)
+        if edge is None:
+            return
+        self.edge_weights[edge] = weight
+        if self.__arrays is not None:
+            self.__arrays[1][edge] = weight
+
+    @property
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Edge sources, weights and target slots as numpy arrays
+        """
+        if self.__arrays is None:
+            targets = np.repeat(
+                np.array(self.node_slots, dtype=np.intp),
+                np.diff(np.array(self.edge_offsets, dtype=np.intp)),
+            )
+            self.__arrays = (
+                np.array(self.edge_sources, dtype=np.intp),
+                np.array(self.edge_weights, dtype=float),
+                targets,
+            )
+        return self.__arrays
+
+    def activate(self, *inputs: float) -> List[float]:
+        if len(inputs) != len(self.input_slots):
+            raise ValueError(
+                "Number of inputs does not match number of input nodes")
+        values = [0] * self.slot_count
+        for slot, value in zip(self.input_slots, inputs):
+            values[slot] = value
+        edge_offsets = self.edge_offsets
+        edge_sources = self.edge_sources
+        edge_weights = self.edge_weights
+        for i, slot in enumerate(self.node_slots):
+            total = 0
+            for edge in range(edge_offsets[i], edge_offsets[i + 1]):
+                total += values[edge_sources[edge]] * edge_weights[edge]
+            values[slot] = total
+        return [values[slot] for slot in self.output_slots]
+
+    def activate_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every row of an (n_tests x n_inputs) matrix at once, level by level
+        @returns (n_tests x n_outputs) matrix
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.ndim != 2 or inputs.shape[1] != len(self.input_slots):
+            raise ValueError(
+                "Number of inputs does not match number of input nodes")
+        # slot major, so every node's values over the batch are one contiguous row
+        values = np.zeros((self.slot_count, inputs.shape[0]))
+        values[self.input_slots] = inputs.T
+        sources, weights, targets = self.arrays
+        for level in range(len(self.level_bounds) - 1):
+            start = self.edge_offsets[self.level_bounds[level]]
+            end = self.edge_offsets[self.level_bounds[level + 1]]
+            if start == end:
+                continue
+            # add.at is unbuffered, edges of a node accumulate in the same order as activate
+            np.add.at(
+                values,
+                targets[start:end],
+                values[sources[start:end]] * weights[start:end, None],
+            )
+        return values[self.output_slots].T
+
+    def to_source(self, function_name: str = 'calculate_result') -> Tuple[str, Dict[str, Any]]:
+        """
+        Straight line python source of the plan, every slot is a local variable and weights are inlined
+        @returns source and the globals it needs (weights that have no literal form, like inf or nan)
+        """
+        constants: Dict[str, Any] = {}
+        lines = [
+            f"def {function_name}(*args):",
+            f"    if len(args) != {len(self.input_slots)}:",
+            "        raise ValueError(\"Number of input nodes does not match number of arguments\")",
+        ]
+        if self.input_slots:
+            lines.append(f"    {''.join(f'v{slot}, ' for slot in self.input_slots)}= args")
+        for i, slot in enumerate(self.node_slots):
+            terms = []
+            for edge in range(self.edge_offsets[i], self.edge_offsets[i + 1]):
+                weight = self.edge_weights[edge]
+                if isinstance(weight, (int, float)) and math.isfinite(weight):
+                    literal = repr(weight)
+                else:
+                    literal = f"_w{edge}"
+                    constants[literal] = weight
+                terms.append(f"v{self.edge_sources[edge]} * {literal}")
+            lines.append(f"    v{slot} = {' + '.join(terms) if terms else '0'}")
+        lines.append(f"    return [{', '.join(f'v{slot}' for slot in self.output_slots)}]")
+        return "\n".join(lines) + "\n", constants
+
+    def compile_function(self) -> Callable[..., List[float]]:
+        """
+        Compile the plan into a plain function with the same signature and results as activate
+        """
+        source, namespace = self.to_source()
+        exec(compile(source, "<compiled genome>", "exec"), namespace)
+        return namespace['calculate_result']
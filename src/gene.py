@@ -1,12 +1,14 @@
 import random
 
 class Gene:
-    _INNOVATION_NUMBER: int
+    __slots__ = ('_innovation_number', '_weight')
+
+    _innovation_number: int
     _weight: float
 
     @property
-    def innovation_number(self):
-        return self._INNOVATION_NUMBER
+    def innovation_number(self) -> int:
+        return self._innovation_number
     
     @property
     def weight(self):
@@ -17,8 +19,8 @@ class Gene:
     
     def __eq__(self, __o: object) -> bool:
         if isinstance(__o, Gene):
-            return self.innovation_number == __o.innovation_number
+            return self._innovation_number == __o._innovation_number
         return False
     
     def __hash__(self) -> int:
-        return self.innovation_number
\ No newline at end of file
+        return self._innovation_number
@@ -1,41 +1,91 @@
-CONNECTION_GENE_STORE = {}
-NODE_GENE_STORE = {}
+from typing import Dict
+
+
+class InnovationRegistry:
+    """
+    Innovation numbers of one NEAT run.
+    Connection innovations are keyed by the (from_node, to_node) pair packed into a single int and never change,
+    node innovations come from a monotonic counter. A connection split twice in the same generation gets the same
+    new node, next_generation starts a new generation.
+    """
+
+    def __init__(self, node_count: int = 0) -> None:
+        """
+        @param node_count: Node innovations 1..node_count are taken, e.g. by the input and output nodes
+        """
+        self.__connections: Dict[int, int] = {}
+        self.__last_connection = 0
+        self.__last_node = node_count
+        self.__generation_splits: Dict[int, int] = {}
+
+    @staticmethod
+    def connection_key(from_node: int, to_node: int) -> int:
+        return (from_node << 32) | to_node
+
+    @property
+    def connection_count(self) -> int:
+        return self.__last_connection
+
+    @property
+    def node_count(self) -> int:
+        return self.__last_node
+
+    def connection_innovation(self, from_node: int, to_node: int) -> int:
+        key = (from_node << 32) | to_node
+        innovation = self.__connections.get(key)
+        if innovation is None:
+            self.__last_connection += 1
+            innovation = self.__connections[key] = self.__last_connection
+        return innovation
+
+    def new_node(self) -> int:
+        self.__last_node += 1
+        return self.__last_node
+
+    def reserve_node(self, innovation_number: int):
+        """
+        Keep the counter past a node innovation that was not allocated by this registry
+        """
+        if innovation_number > self.__last_node:
+            self.__last_node = innovation_number
+
+    def split_node(self, from_node: int, to_node: int) -> int:
+        """
+        Node innovation for a node added in the middle of the from_node->to_node connection
+        """
+        key = (from_node << 32) | to_node
+        innovation = self.__generation_splits.get(key)
+        if innovation is None:
+            innovation = self.__generation_splits[key] = self.new_node()
+        return innovation
+
+    def next_generation(self):
+        self.__generation_splits.clear()
+
+    def __str__(self) -> str:
+        return f"InnovationRegistry(nodes={self.__last_node}, connections={self.__last_connection})"
+
+
+# Used by genomes created without a registry of their own
+DEFAULT_REGISTRY = InnovationRegistry()
 
 
 def update_connection_gene_store(from_node: int, to_node: int, value: int):
-    CONNECTION_GENE_STORE.update({
-        f'{from_node}_{to_node}': value
-    })
+    # Innovations are assigned by the registry, kept for compatibility
+    DEFAULT_REGISTRY.connection_innovation(from_node, to_node)
 
 
 def get_next_node_innovation_number() -> int:
-    value = max(list(NODE_GENE_STORE.values())+[0]) + 1
-    return value
+    return DEFAULT_REGISTRY.node_count + 1
+
 
 def update_node_gene_store(value: int):
-    if value not in list(NODE_GENE_STORE.values()):
-        NODE_GENE_STORE.update({
-            f'STATIC_{len(NODE_GENE_STORE.keys())}': value
-        })
+    DEFAULT_REGISTRY.reserve_node(value)
 
 
 def get_connection_innovation_number(from_node: int, to_node: int) -> int:
-    key = f"{from_node}_{to_node}"
-    if key in CONNECTION_GENE_STORE:
-        return CONNECTION_GENE_STORE.get(key)
-    value = max(list(CONNECTION_GENE_STORE.values()) + [0]) + 1
-    CONNECTION_GENE_STORE.update({
-        key: value
-    })
-    return value
+    return DEFAULT_REGISTRY.connection_innovation(from_node, to_node)
 
 
 def get_node_innovation_number(from_node: int, to_node: int) -> int:
-    key = f"{from_node}_{to_node}"
-    if key in NODE_GENE_STORE:
-        return NODE_GENE_STORE.get(key)
-    value = max(list(NODE_GENE_STORE.values())+[0]) + 1
-    NODE_GENE_STORE.update({
-        key: value
-    })
-    return value
+    return DEFAULT_REGISTRY.split_node(from_node, to_node)
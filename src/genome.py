@@ -1,89 +1,493 @@
+import hashlib
 import random
-from typing import List, Optional, Tuple, Dict, Generator
+from typing import List, Optional, Set, Tuple, Dict, Callable
+
+import numpy as np
 from config import DISTANCE_AVG_WEIGHT_DIFF_IMPORTANCE, DISTANCE_DISJOINT_GENES_IMPORTANCE, DISTANCE_EXCESS_GENES_IMPORTANCE, PROBABILITY_CONNECTION_MUTATION, PROBABILITY_CROSSOVER_CONNECTION_DISABLED, PROBABILITY_NODE_MUTATION, PROBABILITY_WEIGHT_MUTATION
 
-from src.connection_gene import ConnectionGene
+from src.connection_gene import ConnectionGene, mutated_weight
+from src.gene_store import DEFAULT_REGISTRY, InnovationRegistry
 # from src.gene_store import get_connection_innovation_number, get_node_innovation_number, update_connection_gene_store, update_node_gene_store, get_next_node_innovation_number
 # from src.state import State
 from utils.enums import NodeType
 from src.node_gene import NodeGene
-from src.graph_mapper import populate_nodes
+from src.feed_forward import FeedForwardNetwork
 
 
-class Genome:
-    __node_genes: Dict[int, NodeGene]
-    __connection_genes: Dict[str, ConnectionGene]
+class _GenomeIndex:
+    """
+    Lookups over the genes of a genome, updated on every node and connection added or removed.
+    dead holds the hidden nodes no output can be reached from, edges only get added outside of
+    pruning so a node can only go from dead to alive, never back.
+    candidates holds every (from_node, to_node) pair a new connection could be created for, from_node
+    left of to_node and not connected yet, candidate_positions is the position of each pair in the list
+    so pairs are added, removed and sampled in O(1). Both are O(V^2), a copy shares them with the index
+    it was copied from and copies them on the first pair added or removed.
+    """
+    __slots__ = ('edges', 'incoming', 'outgoing', 'node_types', 'x_axis', 'type_counts', 'dead', 'candidates', 'candidate_positions', 'candidates_shared')
 
     def __init__(self) -> None:
+        # (from_node, to_node) of every connection, enabled or not
+        self.edges: Set[Tuple[int, int]] = set()
+        self.incoming: Dict[int, Set[int]] = {}
+        self.outgoing: Dict[int, Set[int]] = {}
+        self.node_types: Dict[int, NodeType] = {}
+        self.x_axis: Dict[int, float] = {}
+        self.type_counts: Dict[NodeType, int] = {node_type: 0 for node_type in NodeType}
+        self.dead: Set[int] = set()
+        self.candidates: List[Tuple[int, int]] = []
+        self.candidate_positions: Dict[Tuple[int, int], int] = {}
+        # candidates and candidate_positions are also referenced by another index
+        self.candidates_shared = False
+
+    def __writable_candidates(self):
+        if self.candidates_shared:
+            self.candidates = self.candidates.copy()
+            self.candidate_positions = self.candidate_positions.copy()
+            self.candidates_shared = False
+
+    def __add_candidate(self, from_node: int, to_node: int):
+        if (from_node, to_node) in self.edges or (from_node, to_node) in self.candidate_positions:
+            return
+        self.__writable_candidates()
+        self.candidate_positions[(from_node, to_node)] = len(self.candidates)
+        self.candidates.append((from_node, to_node))
+
+    def __remove_candidate(self, from_node: int, to_node: int):
+        if (from_node, to_node) not in self.candidate_positions:
+            return
+        self.__writable_candidates()
+        position = self.candidate_positions.pop((from_node, to_node))
+        # Move the last pair into the hole
+        last = self.candidates.pop()
+        if position < len(self.candidates):
+            self.candidates[position] = last
+            self.candidate_positions[last] = position
+
+    def __add_node_candidates(self, node: int):
+        x_axis = self.x_axis[node]
+        for other, other_x_axis in self.x_axis.items():
+            if other_x_axis < x_axis:
+                self.__add_candidate(other, node)
+            elif other_x_axis > x_axis:
+                self.__add_candidate(node, other)
+
+    def __remove_node_candidates(self, node: int):
+        for other in self.x_axis:
+            self.__remove_candidate(other, node)
+            self.__remove_candidate(node, other)
+
+    def add_node(self, node: NodeGene, replaced: Optional[NodeGene] = None):
+        if replaced is not None:
+            self.type_counts[replaced.node_type] -= 1
+            self.__remove_node_candidates(node.innovation_number)
+        else:
+            self.incoming[node.innovation_number] = set()
+            self.outgoing[node.innovation_number] = set()
+        self.type_counts[node.node_type] += 1
+        self.node_types[node.innovation_number] = node.node_type
+        self.x_axis[node.innovation_number] = node.x_axis
+        self.__add_node_candidates(node.innovation_number)
+        if replaced is None:
+            if node.node_type == NodeType.HIDDEN:
+                self.dead.add(node.innovation_number)
+        elif replaced.node_type != node.node_type:
+            self.dead = self.dead_nodes()
+
+    def remove_node(self, node: NodeGene):
+        self.type_counts[node.node_type] -= 1
+        self.incoming.pop(node.innovation_number)
+        self.outgoing.pop(node.innovation_number)
+        self.node_types.pop(node.innovation_number)
+        self.__remove_node_candidates(node.innovation_number)
+        self.x_axis.pop(node.innovation_number)
+        self.dead.discard(node.innovation_number)
+
+    def __reaches_output(self, node: int) -> bool:
+        node_type = self.node_types[node]
+        return node_type == NodeType.OUTPUT or (node_type == NodeType.HIDDEN and node not in self.dead)
+
+    def add_edge(self, from_node: int, to_node: int):
+        self.edges.add((from_node, to_node))
+        self.outgoing[from_node].add(to_node)
+        self.incoming[to_node].add(from_node)
+        self.__remove_candidate(from_node, to_node)
+        if from_node in self.dead and self.__reaches_output(to_node):
+            # from_node and every dead node leading to it are alive now
+            self.dead.discard(from_node)
+            stack = [from_node]
+            while stack:
+                for source in self.incoming[stack.pop()]:
+                    if source in self.dead:
+                        self.dead.discard(source)
+                        stack.append(source)
+
+    def dead_nodes(self) -> Set[int]:
+        """
+        Hidden nodes no output can be reached from, one reverse walk from the outputs, O(V + E)
+        """
+        reached = {node for node, node_type in self.node_types.items() if node_type == NodeType.OUTPUT}
+        stack = list(reached)
+        while stack:
+            for source in self.incoming[stack.pop()]:
+                if source not in reached:
+                    reached.add(source)
+                    stack.append(source)
+        return {node for node, node_type in self.node_types.items() if node_type == NodeType.HIDDEN and node not in reached}
+
+    def remove_edge(self, from_node: int, to_node: int):
+        self.edges.discard((from_node, to_node))
+        self.outgoing[from_node].discard(to_node)
+        self.incoming[to_node].discard(from_node)
+        if self.x_axis[from_node] < self.x_axis[to_node]:
+            self.__add_candidate(from_node, to_node)
+
+    def copy(self) -> '_GenomeIndex':
+        index = _GenomeIndex()
+        index.edges = self.edges.copy()
+        index.incoming = {node: sources.copy() for node, sources in self.incoming.items()}
+        index.outgoing = {node: targets.copy() for node, targets in self.outgoing.items()}
+        index.node_types = self.node_types.copy()
+        index.x_axis = self.x_axis.copy()
+        index.type_counts = self.type_counts.copy()
+        index.dead = self.dead.copy()
+        index.candidates = self.candidates
+        index.candidate_positions = self.candidate_positions
+        index.candidates_shared = True
+        self.candidates_shared = True
+        return index
+
+
+class ConnectionGeneView:
+    """
+    Connection gene of a Genome as returned by connection_genes and get_connection.
+    Reads the genome's current gene and writes through the genome, so a gene shared with copies of the
+    genome is copied before it changes and the compiled network, fingerprint and version follow the write.
+    """
+    __slots__ = ('_genome', '_innovation_number')
+
+    def __init__(self, genome: 'Genome', innovation_number: int) -> None:
+        self._genome = genome
+        self._innovation_number = innovation_number
+
+    @property
+    def _gene(self) -> ConnectionGene:
+        return self._genome._connection_gene(self._innovation_number)
+
+    @property
+    def innovation_number(self) -> int:
+        return self._innovation_number
+
+    @property
+    def from_node(self) -> int:
+        return self._gene.from_node
+
+    @property
+    def to_node(self) -> int:
+        return self._gene.to_node
+
+    @property
+    def weight(self) -> float:
+        return self._gene.weight
+
+    @property
+    def enabled(self) -> bool:
+        return self._gene.enabled
+
+    def mutate_weight(self):
+        self._genome._set_connection_weight(self._innovation_number, mutated_weight(self.weight))
+
+    def mutate_enabled(self):
+        self._genome._set_connection_enabled(self._innovation_number, not self.enabled)
+
+    def set_weight(self, weight: float):
+        self._genome._set_connection_weight(self._innovation_number, weight)
+
+    def set_enabled(self, enabled: bool):
+        if enabled != self.enabled:
+            self._genome._set_connection_enabled(self._innovation_number, enabled)
+
+    def copy(self) -> ConnectionGene:
+        return self._gene.copy()
+
+    def __eq__(self, __o: object) -> bool:
+        if isinstance(__o, (ConnectionGeneView, ConnectionGene)):
+            return self._innovation_number == __o.innovation_number
+        return False
+
+    def __hash__(self) -> int:
+        return self._innovation_number
+
+    def __str__(self) -> str:
+        return str(self._gene)
+
+
+class Genome:
+    __node_genes: Dict[int, NodeGene]
+    __connection_genes: Dict[int, ConnectionGene]
+    __network: Optional[FeedForwardNetwork]
+    __version: int
+    __network_version: int
+    __fingerprint: Optional[bytes]
+    __fingerprint_version: int
+    __gene_arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    __gene_arrays_version: int
+    __registry: InnovationRegistry
+    # Copy on write, see copy
+    __nodes_shared: bool
+    __connections_shared: bool
+    __network_shared: bool
+    __private_connections: Optional[Set[int]]
+    __index: _GenomeIndex
+    __index_shared: bool
+    # Cached views of the genes, dropped whenever the gene dicts change
+    __node_tuple: Optional[Tuple[NodeGene, ...]]
+    __connection_tuple: Optional[Tuple[ConnectionGene, ...]]
+    __nodes_by_type: Optional[Dict[NodeType, Tuple[NodeGene, ...]]]
+
+    def __init__(self, registry: Optional[InnovationRegistry] = None) -> None:
+        self.__registry = registry if registry is not None else DEFAULT_REGISTRY
         self.__node_genes = {}
         self.__connection_genes = {}
+        self.__nodes_shared = False
+        self.__connections_shared = False
+        self.__network_shared = False
+        # Connection genes this genome may write in place, None while it shares none of them
+        self.__private_connections = None
+        self.__index = _GenomeIndex()
+        self.__index_shared = False
+        self.__node_tuple = None
+        self.__connection_tuple = None
+        self.__nodes_by_type = None
+        self.__network = None
+        self.__version = 0
+        self.__network_version = -1
+        self.__fingerprint = None
+        self.__fingerprint_version = -1
+        self.__gene_arrays = None
+        self.__gene_arrays_version = -1
         # self.__state = State()
-    
+
+    @property
+    def registry(self) -> InnovationRegistry:
+        return self.__registry
+
     @property
-    def hidden_node_count(self):
-        return len([node for node in self.node_genes if node.node_type == NodeType.HIDDEN])
+    def version(self) -> int:
+        """
+        Incremented on every change to the genes of the genome
+        """
+        return self.__version
+
+    def __structure_changed(self):
+        self.__version += 1
+
+    def __connection_changed(self, connection: ConnectionGene, structural: bool):
+        is_network_current = self.__network is not None and self.__network_version == self.__version
+        self.__version += 1
+        if structural or not is_network_current:
+            return
+        # Weight only change, patch the compiled network instead of recompiling it
+        if self.__network_shared:
+            self.__network = self.__network.copy()
+            self.__network_shared = False
+        self.__network.set_weight(connection.from_node, connection.to_node, connection.weight)
+        self.__network_version = self.__version
     
+    @property
+    def fingerprint(self) -> bytes:
+        """
+        Hash of the structure and weights of the genome, equal for genomes that compute the same network
+        """
+        if self.__fingerprint is None or self.__fingerprint_version != self.__version:
+            nodes = sorted((node.innovation_number, int(node.node_type), node.x_axis) for node in self.node_genes)
+            connections = sorted((connection.from_node, connection.to_node, connection.weight, connection.enabled) for connection in self.__connections())
+            self.__fingerprint = hashlib.blake2b(repr((nodes, connections)).encode('utf-8'), digest_size=16).digest()
+            self.__fingerprint_version = self.__version
+        return self.__fingerprint
+
+    @property
+    def gene_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Integer innovation numbers of the connection genes in increasing order and their aligned weights
+        """
+        innovations, weights, _ = self.__gene_table()
+        return innovations, weights
+
+    def __gene_table(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        gene_arrays and the aligned enabled flags
+        """
+        if self.__gene_arrays is None or self.__gene_arrays_version != self.__version:
+            connections = self.__connections()
+            innovations = np.fromiter(
+                (connection.innovation_number for connection in connections),
+                dtype=np.int64, count=len(connections))
+            weights = np.fromiter((connection.weight for connection in connections), dtype=float, count=len(connections))
+            enabled = np.fromiter((connection.enabled for connection in connections), dtype=bool, count=len(connections))
+            order = np.argsort(innovations)
+            self.__gene_arrays = (innovations[order], weights[order], enabled[order])
+            self.__gene_arrays_version = self.__version
+        return self.__gene_arrays
+
+    @property
+    def hidden_node_count(self) -> int:
+        return self.__index.type_counts[NodeType.HIDDEN]
+
+    def nodes_of_type(self, node_type: NodeType) -> Tuple[NodeGene, ...]:
+        if self.__nodes_by_type is None:
+            nodes_by_type: Dict[NodeType, List[NodeGene]] = {node_type: [] for node_type in NodeType}
+            for node in self.__node_genes.values():
+                nodes_by_type[node.node_type].append(node)
+            self.__nodes_by_type = {node_type: tuple(nodes) for node_type, nodes in nodes_by_type.items()}
+        return self.__nodes_by_type[node_type]
+
+    def has_connection(self, from_node: int, to_node: int) -> bool:
+        return (from_node, to_node) in self.__index.edges
+
+    @property
+    def connection_candidates(self) -> List[Tuple[int, int]]:
+        """
+        Every (from_node, to_node) pair connection_mutation can connect, do not modify
+        """
+        return self.__index.candidates
+
+    def incoming_nodes(self, node: int) -> Set[int]:
+        """
+        Nodes with a connection into node, do not modify
+        """
+        return self.__index.incoming[node]
+
+    def outgoing_nodes(self, node: int) -> Set[int]:
+        """
+        Nodes node has a connection to, do not modify
+        """
+        return self.__index.outgoing[node]
+
+    def __writable_nodes(self) -> Dict[int, NodeGene]:
+        if self.__nodes_shared:
+            self.__node_genes = self.__node_genes.copy()
+            self.__nodes_shared = False
+        self.__node_tuple = None
+        self.__nodes_by_type = None
+        return self.__node_genes
+
+    def __writable_connections(self) -> Dict[int, ConnectionGene]:
+        if self.__connections_shared:
+            self.__connection_genes = self.__connection_genes.copy()
+            self.__connections_shared = False
+        self.__connection_tuple = None
+        return self.__connection_genes
+
+    def __writable_index(self) -> _GenomeIndex:
+        if self.__index_shared:
+            self.__index = self.__index.copy()
+            self.__index_shared = False
+        return self.__index
+
+    def __writable_connection(self, innovation_number: int) -> ConnectionGene:
+        """
+        Connection gene of this genome only, copied first if it is shared with other genomes
+        """
+        connection = self.__connection_genes[innovation_number]
+        if self.__private_connections is None or innovation_number in self.__private_connections:
+            return connection
+        connection = connection.copy()
+        self.__writable_connections()[innovation_number] = connection
+        self.__private_connections.add(innovation_number)
+        return connection
+
     def remove_useless_leafs(self):
-        useless_nodes: List[int] = []
-        output_nodes:List[NodeGene] = []
-        _all_nodes:List[NodeGene] = self.node_genes
-        _all_connections:List[ConnectionGene] = self.connection_genes
-        for node in _all_nodes:
-            if node.node_type in [NodeType.OUTPUT, NodeType.INPUT]:
-                if node.node_type == NodeType.OUTPUT:
-                    output_nodes.append(node)
-                continue
-            useless_nodes.append(node.innovation_number)
-        def connections_to_node(node: int, all_connections: List[ConnectionGene]):
-            for connection in all_connections:
-                if connection.to_node == node:
-                    yield connection
-        def recursive_browse_connections(connections: Generator[ConnectionGene, None, None], all_connections: List[ConnectionGene]):
-            for connection in connections:
-                if connection.from_node in useless_nodes:
-                    useless_nodes.remove(connection.from_node)
-                if connection.to_node in useless_nodes:
-                    useless_nodes.remove(connection.to_node)
-                recursive_browse_connections(connections_to_node(connection.from_node, all_connections), all_connections)
-                # recursive_browse_connections(connections_to_node(connection.to_node, all_connections), all_connections)
-        for output_node in output_nodes:
-            recursive_browse_connections(connections_to_node(output_node.innovation_number, _all_connections), _all_connections)
+        """
+        Remove hidden nodes that no output can be reached from, with their connections.
+        Those nodes are tracked as genes are added, genomes without any are left untouched
+        """
+        if not self.__index.dead:
+            return
+        # Node order, so pruning the same genome always removes genes in the same order
+        useless_nodes = [node for node in self.__node_genes if node in self.__index.dead]
+        index = self.__writable_index()
         for node in useless_nodes:
-            self.__node_genes.pop(node)
-            for connection in self.connection_genes:
-                if connection.from_node == node or connection.to_node == node:
-                    if connection.innovation_number in self.__connection_genes:
-                        self.__connection_genes.pop(connection.innovation_number)
+            edges = [(source, node) for source in index.incoming[node]] + [(node, target) for target in index.outgoing[node]]
+            for from_node, to_node in edges:
+                self.__writable_connections().pop(self.__registry.connection_innovation(from_node, to_node))
+                index.remove_edge(from_node, to_node)
+            index.remove_node(self.__writable_nodes().pop(node))
+        if useless_nodes:
+            self.__structure_changed()
 
-    @property
-    def _next_node_innovation(self):
-        return max(list(self.__node_genes.keys()) + [0]) + 1
+    def _new_node_innovation(self) -> int:
+        return self.__registry.new_node()
 
     def get_node(self, innovation_number: int):
         return self.__node_genes.get(innovation_number, None)
     
     def add_node(self, node: NodeGene):
-        self.__node_genes.update({node.innovation_number: node})
+        self.__writable_index().add_node(node, replaced=self.__node_genes.get(node.innovation_number, None))
+        self.__writable_nodes().update({node.innovation_number: node})
+        self.__registry.reserve_node(node.innovation_number)
+        self.__structure_changed()
     
-    def get_connection(self, innovation_number: int):
-        return self.__connection_genes.get(innovation_number, None)
+    def get_connection(self, innovation_number: int) -> Optional[ConnectionGeneView]:
+        if innovation_number not in self.__connection_genes:
+            return None
+        return ConnectionGeneView(self, innovation_number)
+
+    def _connection_gene(self, innovation_number: int) -> ConnectionGene:
+        """
+        Gene as stored, possibly shared with copies of this genome, do not modify
+        """
+        return self.__connection_genes[innovation_number]
+
+    def _set_connection_weight(self, innovation_number: int, weight: float):
+        connection = self.__writable_connection(innovation_number)
+        connection.set_weight(weight)
+        self.__connection_changed(connection, False)
+
+    def _set_connection_enabled(self, innovation_number: int, enabled: bool):
+        if self.__connection_genes[innovation_number].enabled == enabled:
+            return
+        connection = self.__writable_connection(innovation_number)
+        connection.set_enabled(enabled)
+        self.__connection_changed(connection, True)
+
+    @property
+    def network(self) -> FeedForwardNetwork:
+        """
+        Execution plan of the genome, compiled on first use and kept until the genome changes
+        """
+        if self.__network is None or self.__network_version != self.__version:
+            try:
+                self.__network = FeedForwardNetwork.create(self.node_genes, self.__connections())
+                self.__network_shared = False
+            except Exception as e:
+                print(self)
+                raise e
+            self.__network_version = self.__version
+        return self.__network
 
     def calculate_result(self, *args: float):
-        input_nodes: List[NodeGene] = [
-            node for node in self.node_genes if node.node_type == NodeType.INPUT]
-        if len(input_nodes) != len(args):
-            print(len(input_nodes), len(args),
+        network = self.network
+        if len(network.input_slots) != len(args):
+            print(len(network.input_slots), len(args),
                   self.__node_genes, self.__connection_genes)
-            print(input_nodes)
             raise ValueError(
                 "Number of input nodes does not match number of arguments")
-        # gene_graph_mapper = GeneGraphMapper(self.node_genes, self.connection_genes)
-        try:
-            return populate_nodes(self.connection_genes, self.node_genes, *args)
-        except Exception as e:
-            print(self)
-            raise e
-        # return gene_graph_mapper.propagate(*args)
+        return network.activate(*args)
+
+    def compile_function(self) -> Callable[..., List[float]]:
+        """
+        Generate and compile straight line python for the current genes, for hot evaluation loops.
+        The returned function behaves like calculate_result but does not follow later mutations.
+        """
+        return self.network.compile_function()
+
+    def calculate_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Evaluate an (n_tests x n_inputs) matrix of inputs in one pass
+        @returns (n_tests x n_outputs) matrix of outputs
+        """
+        return self.network.activate_batch(inputs)
 
     def connection_mutation(self, nodes: Optional[Tuple[NodeGene, NodeGene]] = None):
         """
@@ -97,12 +501,13 @@ class Genome:
                     node_from, node_to = nodes
 
         if None in [node_from, node_to]:
-            node_from = random.choice(self.node_genes)
-            remaining = [node for node in self.node_genes if node != node_from and node.x_axis > node_from.x_axis]
-            if not remaining:
-                # Does not have any remaining valid nodes
+            candidates = self.__index.candidates
+            if not candidates:
+                # Every valid pair of nodes is connected already
                 return
-            node_to = random.choice(remaining)
+            from_node, to_node = random.choice(candidates)
+            self.create_connection(from_node, to_node)
+            return
 
         if node_from.innovation_number not in self.__node_genes or node_to.innovation_number not in self.__node_genes:
             raise ValueError(
@@ -121,10 +526,9 @@ class Genome:
             node_from, node_to = node_to, node_from
 
         # Check if connection already exists
-        for connection in self.connection_genes:
-            if connection.from_node == node_from.innovation_number and connection.to_node == node_to.innovation_number:
-                # print("Connection Mutation Failed, Connection already exists")
-                return
+        if self.has_connection(node_from.innovation_number, node_to.innovation_number):
+            # print("Connection Mutation Failed, Connection already exists")
+            return
 
         # Create connection
         self.create_connection(node_from.innovation_number,
@@ -135,8 +539,8 @@ class Genome:
         """
         Break a connection into two, adding a node in between
         """
-        if not isinstance(connection_to_break, ConnectionGene):
-            connection_to_break = random.choice(self.connection_genes)
+        if not isinstance(connection_to_break, (ConnectionGene, ConnectionGeneView)):
+            connection_to_break = random.choice(self.__connections())
 
         if connection_to_break.innovation_number not in self.__connection_genes:
             raise ValueError(
@@ -156,8 +560,12 @@ class Genome:
         middle_x = (node_a.x_axis + node_b.x_axis) / 2
         # print('Selected Nodes', (node_a.innovation_number, node_a.x_axis), (node_b.innovation_number, node_b.x_axis))
         # print('Middle X', middle_x)
+        # Same split in the same generation, same node. Unless this genome already split the connection before
+        innovation_number = self.__registry.split_node(node_a.innovation_number, node_b.innovation_number)
+        if innovation_number in self.__node_genes:
+            innovation_number = self.__registry.new_node()
         new_node = NodeGene(
-            self._next_node_innovation,
+            innovation_number,
             node_type=NodeType.HIDDEN,
             x_axis=middle_x,
         )
@@ -165,8 +573,8 @@ class Genome:
         self.add_node(new_node)
         
         # Disable existing connection
-        if connection_to_break.enabled:
-            connection_to_break.mutate_enabled()
+        connection_to_break = self.__connection_genes[connection_to_break.innovation_number]
+        self._set_connection_enabled(connection_to_break.innovation_number, False)
 
         # Create new connection
         self.create_connection(node_a.innovation_number,
@@ -176,12 +584,28 @@ class Genome:
 
         # print("Node Mutation Successful")
 
+    @property
+    def connection_weights(self) -> np.ndarray:
+        """
+        Weights of connection_genes, in the same order
+        """
+        connections = self.__connections()
+        return np.fromiter((connection.weight for connection in connections), dtype=float, count=len(connections))
+
+    def set_connection_weights(self, weights: np.ndarray):
+        """
+        Set the weights of connection_genes, in the same order, only the genes whose weight changed are written
+        """
+        for connection, weight in zip(self.__connections(), weights.tolist()):
+            if weight != connection.weight:
+                self._set_connection_weight(connection.innovation_number, weight)
+
     def weight_mutation(self):
-        random_connection = random.choice(self.connection_genes)
+        random_connection = random.choice(self.__connections())
         # inn = random_connection.innovation_number
         # print("Weight before", random_connection.weight)
         # print("Weight Mutation", random_connection)
-        random_connection.mutate_weight()
+        self._set_connection_weight(random_connection.innovation_number, mutated_weight(random_connection.weight))
         # print("Weight after", self.__state.get_connection(inn).weight)
         # for connection in self.connection_genes:
         #     connection.mutate_weight()
@@ -198,19 +622,25 @@ class Genome:
             raise ValueError(
                 "Cannot create connection, from_node must be on the left of to_node")
         if from_node in self.__node_genes and to_node in self.__node_genes:
-            connection = self.__connection_genes.get(
-                f"{from_node}->{to_node}", None)
-            if not connection:
+            innovation_number = self.__registry.connection_innovation(from_node, to_node)
+            if innovation_number in self.__connection_genes:
+                connection = self.__writable_connection(innovation_number)
+            else:
                 connection = ConnectionGene(
                     from_node=from_node,
                     to_node=to_node,
+                    innovation=innovation_number,
                 )
+                if self.__private_connections is not None:
+                    self.__private_connections.add(innovation_number)
+                self.__writable_index().add_edge(from_node, to_node)
             if weight:
                 connection.set_weight(weight)
             if isinstance(enabled, bool):
                 connection.set_enabled(enabled)
-            self.__connection_genes.update(
+            self.__writable_connections().update(
                 {connection.innovation_number: connection})
+            self.__structure_changed()
         else:
             raise ValueError("One or more nodes are not in the genome")
 
@@ -227,7 +657,10 @@ class Genome:
     #         for inp_node in inp_nodes:
     #             self.create_connection(inp_node, node.innovation_number)
 
-    def mutate(self):
+    def mutate(self, weights: bool = True):
+        """
+        @param weights: False when the weights are mutated for the whole population at once, see src.mutation
+        """
         event = random.random()
         sorted_actions = sorted([
             (PROBABILITY_NODE_MUTATION, self.node_mutation),
@@ -236,7 +669,8 @@ class Genome:
         ], key=lambda x: x[0])
         for event_threshold, action in sorted_actions:
             if event < event_threshold:
-                action()
+                if weights or action != self.weight_mutation:
+                    action()
                 break
             # event -= event_threshold
         # if PROBABILITY_NODE_MUTATION > random.random():
@@ -247,12 +681,22 @@ class Genome:
         #     self.weight_mutation()
 
     @property
-    def node_genes(self):
-        return list(self.__node_genes.values()).copy()
+    def node_genes(self) -> Tuple[NodeGene, ...]:
+        if self.__node_tuple is None:
+            self.__node_tuple = tuple(self.__node_genes.values())
+        return self.__node_tuple
+
+    def __connections(self) -> Tuple[ConnectionGene, ...]:
+        if self.__connection_tuple is None:
+            self.__connection_tuple = tuple(self.__connection_genes.values())
+        return self.__connection_tuple
 
     @property
-    def connection_genes(self):
-        return list(self.__connection_genes.values()).copy()
+    def connection_genes(self) -> Tuple[ConnectionGeneView, ...]:
+        """
+        Views of the connection genes, changes made through them are written to this genome only
+        """
+        return tuple(ConnectionGeneView(self, innovation_number) for innovation_number in self.__connection_genes)
 
     @staticmethod
     def distance(genome_a: 'Genome', genome_b: 'Genome') -> float:
@@ -263,70 +707,30 @@ class Genome:
         'N' is number of genes in larger one
         @returns C1*E/N + C2*D/N + C3*W
         """
-        max_innovation_number = max(
-            max([connection.innovation_number for connection in genome_a.connection_genes]),
-            max([connection.innovation_number for connection in genome_b.connection_genes])
-        )
-        min_innovation_number = min(
-            min([connection.innovation_number for connection in genome_a.connection_genes]),
-            min([connection.innovation_number for connection in genome_b.connection_genes])
-        )
+        innovations_a, weights_a = genome_a.gene_arrays
+        innovations_b, weights_b = genome_b.gene_arrays
+        number_of_genes_in_larger_genome = max(len(innovations_a), len(innovations_b))
+        if number_of_genes_in_larger_genome == 0:
+            return 0.0
 
-        connections_larger: List[ConnectionGene] = []
-        connections_smaller: List[ConnectionGene] = []
-        for innovation in range(min_innovation_number, max_innovation_number+1):
-            inn_a = None
-            inn_b = None
-            for connection in genome_a.connection_genes:
-                if connection.innovation_number == innovation:
-                    inn_a = connection
-                    break
-            for connection in genome_b.connection_genes:
-                if connection.innovation_number == innovation:
-                    inn_b = connection
-                    break
-            connections_larger.append(inn_a)
-            connections_smaller.append(inn_b)
-
-        number_of_genes_in_larger_genome = len([
-            connection for connection in connections_larger if connection is not None
-        ])
-        number_of_genes_in_smaller_genome = len([
-            connection for connection in connections_smaller if connection is not None
-        ])
-
-        if number_of_genes_in_larger_genome < number_of_genes_in_smaller_genome:
-            connections_larger, connections_smaller = connections_smaller, connections_larger
-
-        max_innovation_number_for_smaller_genome = max([
-            connection.innovation_number for connection in connections_smaller if connection is not None
-        ])
+        _, matching_a, matching_b = np.intersect1d(innovations_a, innovations_b, assume_unique=True, return_indices=True)
+        equal_genes = len(matching_a)
 
+        # Excess genes are past the last innovation of the other genome, both arrays are sorted
         excess_genes = 0
-        disjoint_genes = 0
-        average_weight_difference = 0
-        equal_genes = 0
-        is_disjoint = number_of_genes_in_smaller_genome > 0
-
-        for connection_large, connection_small in zip(connections_larger, connections_smaller):
-            if isinstance(connection_small, ConnectionGene) and isinstance(connection_large, ConnectionGene):  # matching genes
-                average_weight_difference += abs(
-                    connection_large.weight - connection_small.weight)
-                equal_genes += 1
-            elif is_disjoint:  # disjoint genes
-                disjoint_genes += 1
-            else:  # excess genes
-                excess_genes += 1
-            if isinstance(connection_small, ConnectionGene):
-                is_disjoint = connection_small.innovation_number < max_innovation_number_for_smaller_genome
-
-        average_weight_difference /= equal_genes
-
-        # print("Excess genes:", excess_genes)
-        # print("Disjoint genes:", disjoint_genes)
-        # print("Average weight difference:", average_weight_difference)
-        # print("Number of genes in larger genome:",
-        #       number_of_genes_in_larger_genome)
+        if len(innovations_b):
+            excess_genes += len(innovations_a) - int(np.searchsorted(innovations_a, innovations_b[-1], side='right'))
+        else:
+            excess_genes += len(innovations_a)
+        if len(innovations_a):
+            excess_genes += len(innovations_b) - int(np.searchsorted(innovations_b, innovations_a[-1], side='right'))
+        else:
+            excess_genes += len(innovations_b)
+        disjoint_genes = len(innovations_a) + len(innovations_b) - 2 * equal_genes - excess_genes
+
+        average_weight_difference = 0.0
+        if equal_genes:
+            average_weight_difference = float(np.abs(weights_a[matching_a] - weights_b[matching_b]).mean())
 
         return (DISTANCE_EXCESS_GENES_IMPORTANCE*excess_genes / number_of_genes_in_larger_genome) + \
             (DISTANCE_DISJOINT_GENES_IMPORTANCE*disjoint_genes / number_of_genes_in_larger_genome) + \
@@ -339,132 +743,58 @@ class Genome:
         @param genome_a: More Fit genome
         @param genome_b: Less Fit genome
         """
-        child_genome = Genome()
+        return Genome.crossover_many([(genome_a, genome_b)])[0]
 
-        # Input/Output nodes from fitter parent
-        for node in genome_a.node_genes:
-            if node.node_type in [NodeType.INPUT, NodeType.OUTPUT]:
-                _node = NodeGene(
-                    child_genome._next_node_innovation,
-                    weight=node.weight,
-                    node_type=node.node_type,
-                )
-                child_genome.add_node(_node)
-
-        # copied_nodes = {}
-
-        # Node genes from the fitter parent
-        # for node_gene in genome_a.node_genes:
-        #     node = state.copy_node(node_gene.innovation_number)
-        #     child_genome.add_node(node.innovation_number)
-        #     copied_nodes[node_gene.innovation_number] = node.innovation_number
-
-        # if equal_fitness:
-        #     # Node genes from the other equally fit parent
-        #     for node_gene in genome_b.node_genes:
-        #         if node_gene not in genome_a.node_genes:
-        #             node = state.copy_node(node_gene.innovation_number)
-        #             child_genome.add_node(node.innovation_number)
-        #             copied_nodes[node_gene.innovation_number] = node.innovation_number
-
-        for connection_gene in genome_a.connection_genes:
-            child_gene = None
-            selected_parent = None
-            if connection_gene in genome_b.connection_genes:  # matching gene, choose randomly
-                from_parent_a = (connection_gene, genome_a)
-                from_parent_b = (genome_b.connection_genes[genome_b.connection_genes.index(
-                    connection_gene)], genome_b)
-                is_disabled = False in [
-                    from_parent_a[0].enabled, from_parent_b[0].enabled]
-                child_gene, selected_parent = random.choice(
-                    [from_parent_a, from_parent_b])
-                child_gene = child_gene.copy()
-                # child_gene.from_node = copied_nodes[child_gene.from_node]
-                # child_gene.to_node = copied_nodes[child_gene.to_node]
-                if is_disabled and PROBABILITY_CROSSOVER_CONNECTION_DISABLED > random.random():
-                    if child_gene.enabled:
-                        # if parent has disabled gene and we fall in probability, set child disabled
-                        child_gene.mutate_enabled()
-                else:
-                    if not child_gene.enabled:
-                        # if we do not fall in probability and child has disabled gene, set child enabled
-                        child_gene.mutate_enabled()
-            else:  # Excess or disjoint gene, take all from fitter parent
-                # state.copy_connection(connection_gene.innovation_number)
-                child_gene = connection_gene.copy()
-                selected_parent = genome_a
-                # child_gene.from_node = copied_nodes[connection_gene.from_node]
-                # child_gene.to_node = copied_nodes[connection_gene.to_node]
-            if isinstance(child_gene, ConnectionGene) and child_gene not in child_genome.connection_genes:
-                _from_node = selected_parent.get_node(child_gene.from_node)
-                _to_node = selected_parent.get_node(child_gene.to_node)
-                from_node = NodeGene(
-                    child_genome._next_node_innovation,
-                    weight=_from_node.weight,
-                    node_type=_from_node.node_type,
-                    x_axis=_from_node.x_axis,
-                )
-                if from_node.node_type == NodeType.INPUT:
-                    from_node = child_genome.get_node(_from_node.innovation_number)
-                child_genome.add_node(from_node)
-                to_node = NodeGene(
-                    child_genome._next_node_innovation,
-                    weight=_to_node.weight,
-                    node_type=_to_node.node_type,
-                    x_axis=_to_node.x_axis,
-                )
-                if to_node.node_type == NodeType.OUTPUT:
-                    to_node = child_genome.get_node(_to_node.innovation_number)
-                child_genome.add_node(to_node)
-                try:
-                    child_genome.create_connection(
-                        from_node.innovation_number,
-                        to_node.innovation_number,
-                        weight=child_gene.weight,
-                        enabled=child_gene.enabled
-                    )
-                except Exception as e:
-                    print(child_genome)
-                    raise e
-
-        # if equal_fitness:
-        #     # Add the rest of the genes from the other parent
-        #     for connection_gene in genome_b.connection_genes:
-        #         if genome_b.get_node(connection_gene.from_node).node_type == NodeType.INPUT or genome_b.get_node(connection_gene.to_node).node_type == NodeType.OUTPUT:
-        #             continue
-        #         if connection_gene not in child_genome.connection_genes:
-        #             from_node = NodeGene(
-        #                 child_genome._next_node_innovation,
-        #                 weight=genome_b.get_node(connection_gene.from_node).weight,
-        #                 node_type=genome_b.get_node(connection_gene.from_node).node_type,
-        #                 x_axis=genome_b.get_node(connection_gene.from_node).x_axis
-        #             )
-        #             if from_node.node_type == NodeType.INPUT:
-        #                 from_node = child_genome.get_node(connection_gene.from_node)
-        #             child_genome.add_node(from_node)
-        #             to_node = NodeGene(
-        #                 child_genome._next_node_innovation,
-        #                 weight=genome_b.get_node(connection_gene.to_node).weight,
-        #                 node_type=genome_b.get_node(connection_gene.to_node).node_type,
-        #                 x_axis=genome_b.get_node(connection_gene.to_node).x_axis
-        #             )
-        #             if to_node.node_type == NodeType.OUTPUT:
-        #                 to_node = child_genome.get_node(connection_gene.to_node)
-        #             child_genome.add_node(to_node)
-        #             # conn.from_node = copied_nodes[connection_gene.from_node]
-        #             # conn.to_node = copied_nodes[connection_gene.to_node]
-        #             child_genome.create_connection(
-        #                 from_node,
-        #                 to_node,
-        #                 weight=connection_gene.weight,
-        #                 enabled=connection_gene.enabled
-        #             )
+    @staticmethod
+    def crossover_many(pairs: List[Tuple['Genome', 'Genome']]) -> List['Genome']:
+        """
+        Crossover of every (more fit, less fit) pair, in order. Matching genes of a pair are found with one
+        searchsorted over the parents' gene arrays, the random draws of every pair come from one generator
+        seeded from the python random state
+        """
+        matches = [Genome.__matching_rows(genome_a, genome_b) for genome_a, genome_b in pairs]
+        # Parent choice and disabling draw of every matching gene of every pair at once
+        offsets = np.cumsum([len(rows_a) for rows_a, _ in matches])
+        draws = np.random.default_rng(random.getrandbits(64)).random((2, int(offsets[-1]) if len(offsets) else 0))
+        return [
+            Genome.__crossover(genome_a, genome_b, rows_a, rows_b, pair_draws)
+            for (genome_a, genome_b), (rows_a, rows_b), pair_draws in zip(pairs, matches, np.split(draws, offsets[:-1], axis=1))
+        ]
+
+    @staticmethod
+    def __matching_rows(genome_a: 'Genome', genome_b: 'Genome') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows of the genes both genomes have in their gene arrays, aligned
+        """
+        innovations_a = genome_a.__gene_table()[0]
+        innovations_b = genome_b.__gene_table()[0]
+        if not len(innovations_a) or not len(innovations_b):
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        rows_b = np.minimum(np.searchsorted(innovations_b, innovations_a), len(innovations_b) - 1)
+        rows_a = np.flatnonzero(innovations_b[rows_b] == innovations_a)
+        return rows_a, rows_b[rows_a]
 
+    @staticmethod
+    def __crossover(genome_a: 'Genome', genome_b: 'Genome', rows_a: np.ndarray, rows_b: np.ndarray, draws: np.ndarray) -> 'Genome':
+        # Disjoint and excess genes come from the fitter parent, so the child shares its structure
+        # and node innovations, only matching genes can differ
+        child_genome = genome_a.copy()
+        innovations_a, weights_a, enabled_a = genome_a.__gene_table()
+        _, weights_b, enabled_b = genome_b.__gene_table()
+        # Matching genes take the weight of a random parent
+        weights = np.where(draws[0] < 0.5, weights_b[rows_b], weights_a[rows_a])
+        # Disabled in either parent, the child gene is disabled with PROBABILITY_CROSSOVER_CONNECTION_DISABLED
+        is_disabled = ~(enabled_a[rows_a] & enabled_b[rows_b])
+        enabled = ~(is_disabled & (draws[1] < PROBABILITY_CROSSOVER_CONNECTION_DISABLED))
+        changed = np.flatnonzero((weights != weights_a[rows_a]) | (enabled != enabled_a[rows_a]))
+        for innovation_number, weight, is_enabled in zip(innovations_a[rows_a[changed]].tolist(), weights[changed].tolist(), enabled[changed].tolist()):
+            child_genome._set_connection_weight(innovation_number, weight)
+            child_genome._set_connection_enabled(innovation_number, is_enabled)
         return child_genome
 
     def __str__(self) -> str:
         out = ""
-        for connection in self.connection_genes:
+        for connection in self.__connections():
             message = str(connection)
             if out != "":
                 out += " "
@@ -473,20 +803,37 @@ class Genome:
         return out
 
     def copy(self):
-        genome = Genome()
-        for node_gene in self.node_genes:
-            genome.add_node(node_gene.copy())
-        for connection_gene in self.connection_genes:
-            try:
-                genome.create_connection(
-                    connection_gene.from_node,
-                    connection_gene.to_node,
-                    weight=connection_gene.weight,
-                    enabled=connection_gene.enabled
-                )
-            except Exception as e:
-                for node in self.node_genes:
-                    print(node, node.x_axis)
-                print(self)
-                raise e
+        """
+        Copy on write: the copy shares the gene dicts, gene objects and compiled network of this genome.
+        Either genome copies a dict or gene the first time it writes to it, connection_genes hands out views
+        that write through their genome, so a change made through them never reaches the other genome.
+        """
+        self.__private_connections = set()
+        self.__nodes_shared = True
+        self.__connections_shared = True
+        self.__index_shared = True
+
+        genome = Genome(self.__registry)
+        genome.__node_genes = self.__node_genes
+        genome.__connection_genes = self.__connection_genes
+        genome.__nodes_shared = True
+        genome.__connections_shared = True
+        genome.__private_connections = set()
+        genome.__index = self.__index
+        genome.__index_shared = True
+        genome.__node_tuple = self.__node_tuple
+        genome.__connection_tuple = self.__connection_tuple
+        genome.__nodes_by_type = self.__nodes_by_type
+        if self.__network is not None and self.__network_version == self.__version:
+            # Unchanged genes, reuse the compiled network until either genome patches a weight
+            genome.__network = self.__network
+            genome.__network_version = genome.__version
+            genome.__network_shared = True
+            self.__network_shared = True
+        if self.__fingerprint is not None and self.__fingerprint_version == self.__version:
+            genome.__fingerprint = self.__fingerprint
+            genome.__fingerprint_version = genome.__version
+        if self.__gene_arrays is not None and self.__gene_arrays_version == self.__version:
+            genome.__gene_arrays = self.__gene_arrays
+            genome.__gene_arrays_version = genome.__version
         return genome
@@ -1,7 +1,7 @@
 from typing import List
 
 from src.connection_gene import ConnectionGene
-from src.gene_store import CONNECTION_GENE_STORE, NODE_GENE_STORE, get_connection_innovation_number
+from src.gene_store import DEFAULT_REGISTRY, get_connection_innovation_number
 from src.genome import Genome
 import re
 from src.node_gene import NodeGene
@@ -32,12 +32,10 @@ class Command:
             genome.node_genes[to_node]
         ))
         if isinstance(self.connection_weight, float):
-            genome.connection_genes[-1]._weight = self.connection_weight
+            genome.connection_genes[-1].set_weight(self.connection_weight)
         if isinstance(self.connection_enabled, bool):
             if genome.connection_genes[-1].enabled != self.connection_enabled:
                 genome.connection_genes[-1].mutate_enabled()
-        if isinstance(self.connection_innovation,int):
-            genome.connection_genes[-1]._INNOVATION_NUMBER = self.connection_innovation
         return genome
 
     def execute_node_mutation(self, genome: Genome) -> Genome:
@@ -50,7 +48,7 @@ class Command:
             raise Exception(f"Connection not found for node mutation")
         genome.node_mutation(genome.connection_genes[genome.connection_genes.index(connection)])
         if isinstance(self.connection_weight, float):
-            genome.connection_genes[connection]._weight = self.connection_weight
+            genome.connection_genes[connection].set_weight(self.connection_weight)
         if isinstance(self.connection_enabled, bool):
             if genome.connection_genes[connection].enabled != self.connection_enabled:
                 genome.connection_genes[connection].mutate_enabled()
@@ -63,7 +61,7 @@ class Command:
         connection = genome.connection_genes.index(ConnectionGene(
             None, None, self.connection_innovation, enabled=self.connection_enabled, weight=self.connection_weight))
         if isinstance(self.connection_weight, float):
-            genome.connection_genes[connection]._weight = self.connection_weight
+            genome.connection_genes[connection].set_weight(self.connection_weight)
         if isinstance(self.connection_enabled, bool):
             if genome.connection_genes[connection].enabled != self.connection_enabled:
                 genome.connection_genes[connection].mutate_enabled()
@@ -257,8 +255,7 @@ class GenomeConfig:
             if command.connection_innovation == 8:
                 print("HERE")
             print(str(genome))
-            print(NODE_GENE_STORE)
-            print(CONNECTION_GENE_STORE)
+            print(DEFAULT_REGISTRY)
             genome = command.execute(genome)
         print(str(genome))
         return genome
@@ -0,0 +1,43 @@
+from typing import Sequence
+
+import numpy as np
+from config import PROBABILITY_INDIVIDUAL_WEIGHT_PERTURBATION, PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT, WEIGHT_RANDOM_STRENGTH, WEIGHT_SHIFT_STRENGTH
+
+from src.genome import Genome
+from src.population_arena import arena_slots, shared_arena
+
+
+def mutated_weights(weights: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Every weight reassigned with PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT, shifted with
+    PROBABILITY_INDIVIDUAL_WEIGHT_PERTURBATION and kept otherwise, clipped to [-1, 1]
+    """
+    # Decision and signed strength of every weight, in one draw
+    events, amounts = rng.random((2, len(weights)))
+    amounts = amounts * 2 - 1
+    reassigned = events < PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT
+    shifted = ~reassigned & (events < PROBABILITY_INDIVIDUAL_WEIGHT_REASSIGNMENT + PROBABILITY_INDIVIDUAL_WEIGHT_PERTURBATION)
+    weights = np.where(reassigned, amounts * WEIGHT_RANDOM_STRENGTH, weights + shifted * amounts * WEIGHT_SHIFT_STRENGTH)
+    return np.clip(weights, -1, 1)
+
+
+def mutate_population_weights(genomes: Sequence[Genome], rng: np.random.Generator):
+    """
+    Mutate the connection weights of every genome at once, structural mutations stay on Genome.mutate
+    Genomes stored in one PopulationArena are updated in place in the arena, others through set_connection_weights
+    """
+    if not genomes:
+        return
+    arena = shared_arena(genomes)
+    if arena is not None:
+        slots = np.unique(arena_slots(genomes))
+        rows, _ = arena.live_connection_rows(slots)
+        column = arena.connection_weights
+        column[rows] = mutated_weights(column[rows], rng)
+        arena.touch(slots)
+        return
+    weights = [genome.connection_weights for genome in genomes]
+    offsets = np.cumsum([len(genome_weights) for genome_weights in weights])[:-1]
+    new_weights = mutated_weights(np.concatenate(weights), rng)
+    for genome, genome_weights in zip(genomes, np.split(new_weights, offsets)):
+        genome.set_connection_weights(genome_weights)
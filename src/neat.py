@@ -1,9 +1,21 @@
+import asyncio
+import inspect
 import math
 import random
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Tuple, List, Dict, Optional, Callable
+from typing import Tuple, List, Dict, Optional, Callable, Sequence
 
 from src.genome import Genome
+from src.array_genome import ArrayGenome
+from src.population_arena import PopulationArena, arena_slots, shared_arena
+from src.gene_store import InnovationRegistry
+from src.distributed import Coordinator
+from src.feed_forward import FeedForwardNetwork
+from src.population_evaluator import PopulationEvaluator
+from src.selection import Selection, RouletteSelection, TournamentSelection, select_fittest
+from src.species import Speciation
+from src.mutation import mutate_population_weights
 # from src.state import State
 from src.connection_gene import ConnectionGene
 from src.node_gene import NodeGene
@@ -23,13 +35,57 @@ class NeatConfig:
     outputs: int = 1
     weight_range: Tuple[float, float] = (-1, 1)
     number_of_tests: int = 10
+    workers: int = 0                # processes used to evaluate fitness, 0 or 1 evaluates serially
+    worker_chunk_size: Optional[int] = None     # genomes per task sent to a worker, defaults to 4 tasks per worker
+    async_concurrency: int = 64     # fitness calls awaited at once when fitness_function is async
+    coordinator: Optional[Tuple[str, int]] = None   # (host, port) to serve evaluation to neatpy-worker processes on
+    heartbeat_timeout: float = 5.0  # seconds without a message before a worker's task is queued again
+    coordinator_timeout: Optional[float] = 30.0    # seconds without any connected worker before a generation is evaluated locally, None waits forever
+    fixed_test_set: bool = False    # draw the test inputs once per run instead of every generation
+    evaluation_mode: str = 'random' # test inputs, 'random' (number_of_tests random_input draws) or 'exhaustive' (every input of input_domain)
+    fitness_cache: bool = False     # reuse the fitness of genomes whose structure and weights were already evaluated
+    fitness_cache_max_age: int = 0  # generations a cached fitness stays reusable when the test set changes
+    selection: str = 'roulette'     # parent selection strategy, 'roulette' or 'tournament'
+    tournament_size: int = 3        # genomes competing in every tournament of tournament selection
+    speciation: bool = False        # share fitness within species and give every species its own offspring quota
+    compatibility_threshold: float = 3.0    # initial Genome.distance below which genomes belong to the same species
+    compatibility_threshold_step: float = 0.1   # initial threshold adjustment per generation towards target_species, grows while the species count stays on one side and halves when it crosses
+    target_species: int = 10        # number of species the compatibility threshold is tuned towards
+    genome_backend: str = 'object'  # genome storage, 'object' (gene objects) or 'array' (ArrayGenome, numpy arrays)
+    population_arena: bool = False  # with the 'array' backend, store the genes of every genome in one PopulationArena, in-process evaluation and distances read its columns directly
+    population_weight_mutation: bool = False    # mutate the weights of every offspring in one vectorised pass (src.mutation) instead of in Genome.mutate
+
+
+# Neat instance of a worker process, set by the pool initializer
+_WORKER_NEAT: Optional['Neat'] = None
+
+
+def _initialise_worker(neat: 'Neat'):
+    global _WORKER_NEAT
+    _WORKER_NEAT = neat
+
+
+def _evaluate_worker_chunk(networks: List[FeedForwardNetwork], hidden_nodes: List[int], test_input: List[List[float]]) -> List[float]:
+    return _WORKER_NEAT.evaluate_networks(networks, hidden_nodes, test_input)
 
 
 class Neat:
     def __init__(self, config: NeatConfig):
         if not isinstance(config, NeatConfig):
             raise TypeError("config must be of type NeatConfig")
-        self.__population = [Genome() for i in range(config.population_size)]
+        if config.selection not in ('roulette', 'tournament'):
+            raise ValueError(f"Unknown selection strategy {config.selection}")
+        if config.evaluation_mode not in ('random', 'exhaustive'):
+            raise ValueError(f"Unknown evaluation mode {config.evaluation_mode}")
+        if config.genome_backend not in ('object', 'array'):
+            raise ValueError(f"Unknown genome backend {config.genome_backend}")
+        if config.population_arena and config.genome_backend != 'array':
+            raise ValueError("population_arena requires the 'array' genome backend")
+        self.__genome_class = ArrayGenome if config.genome_backend == 'array' else Genome
+        self.__arena: Optional[PopulationArena] = PopulationArena() if config.population_arena else None
+        # Innovation numbers are per run, several Neat instances can evolve in one process
+        self.__innovations = InnovationRegistry(node_count=config.inputs + config.outputs)
+        self.__population = [self.__create_genome() for i in range(config.population_size)]
         self.__config = config
         self.__population = self.__initialise__(self.__population)
         self.__generation = 1
@@ -39,6 +95,50 @@ class Neat:
         self.__average_performer: Optional[Tuple[Genome, float]] = None
         self.__overall_best_performer: Optional[Tuple[Genome, float]] = None
         self.__generation_graph: Dict[int: Dict[str, float]] = {}
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__coordinator: Optional[Coordinator] = None
+        self.__test_input: Optional[List[List[float]]] = None
+        # Inputs of input_domain and their expected outputs, built once per run in exhaustive evaluation mode
+        self.__truth_table: Optional[Tuple[List[List[float]], Optional[np.ndarray]]] = None
+        # genome fingerprint -> (fitness, generation it was evaluated in)
+        self.__fitness_cache: Dict[bytes, Tuple[float, int]] = {}
+        self.__fitness_cache_stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+        # Offspring of the current generation whose weights are still to be mutated, see population_weight_mutation
+        self.__weight_mutation_pending: List[Genome] = []
+        self.__speciation: Optional[Speciation] = None
+        if config.speciation:
+            self.__speciation = Speciation(
+                compatibility_threshold=config.compatibility_threshold,
+                target_species=config.target_species,
+                threshold_step=config.compatibility_threshold_step,
+            )
+
+    def __getstate__(self):
+        # Sent to worker processes, the pool and coordinator can not be pickled
+        state = self.__dict__.copy()
+        state['_Neat__executor'] = None
+        state['_Neat__coordinator'] = None
+        return state
+
+    def __mutate(self, genome: Genome):
+        if not self.__config.population_weight_mutation:
+            genome.mutate()
+            return
+        genome.mutate(weights=False)
+        self.__weight_mutation_pending.append(genome)
+
+    def __create_genome(self) -> Genome:
+        if self.__arena is not None:
+            return ArrayGenome(self.__innovations, arena=self.__arena)
+        return self.__genome_class(self.__innovations)
+
+    @property
+    def arena(self) -> Optional[PopulationArena]:
+        return self.__arena
+
+    @property
+    def innovations(self) -> InnovationRegistry:
+        return self.__innovations
 
     @property
     def generation(self):
@@ -58,6 +158,17 @@ class Neat:
     def population(self):
         return len(self.__population)
 
+    @property
+    def fitness_cache_stats(self) -> Dict[str, int]:
+        """
+        Fitness cache hits and misses of the last evaluated generation
+        """
+        return self.__fitness_cache_stats
+
+    @property
+    def speciation(self) -> Optional[Speciation]:
+        return self.__speciation
+
     @property
     def best_performer(self):
         return self.__best_performer
@@ -73,6 +184,8 @@ class Neat:
     def fitness_function(self, inputs: List[float], outputs: List[float], hidden_nodes: int):
         """
         Override this function
+        It can be overridden with an async def for I/O bound fitness functions, every call of a generation is then
+        awaited on one event loop with at most NeatConfig.async_concurrency calls in flight
         This sample fitness functions expects 2 inputs and expects xor in outputs and returns the fitness accordingly
         """
         a, b = inputs
@@ -80,6 +193,30 @@ class Neat:
         difference = (abs(output - outputs[0])) * (1 + math.pow(hidden_nodes, 0.5))
         return 1 / (1 + difference)
 
+    def fitness_batch(self, inputs: np.ndarray, outputs: np.ndarray, hidden_nodes: np.ndarray) -> np.ndarray:
+        """
+        Optionally override this function, fitness_function is then not called unless a subclass overrides
+        fitness_function again, the override on the most derived class wins
+        Fitness of every genome on every test at once
+        @param inputs: (n_tests x n_inputs) test inputs
+        @param outputs: (n_genomes x n_tests x n_outputs) outputs of every genome
+        @param hidden_nodes: (n_genomes) hidden node count of every genome
+        @returns (n_genomes x n_tests) fitness, averaged over the tests like fitness_function results
+        """
+        raise NotImplementedError()
+
+    @property
+    def is_batch_fitness(self) -> bool:
+        # A subclass overriding only fitness_function of a batch fitness Neat is evaluated with its fitness_function
+        for cls in type(self).__mro__:
+            if cls is Neat:
+                return False
+            if 'fitness_batch' in vars(cls):
+                return True
+            if 'fitness_function' in vars(cls):
+                return False
+        return False
+
     def random_input(self):
         """
         Override this function
@@ -89,6 +226,45 @@ class Neat:
         b = random.randint(0, 10)
         return [a, b]
 
+    def input_domain(self) -> Sequence[Sequence[float]]:
+        """
+        Override this function for the 'exhaustive' evaluation mode
+        Every input the networks can be given, each genome is evaluated on all of them every generation
+        """
+        raise NotImplementedError("The 'exhaustive' evaluation mode requires input_domain to be overridden")
+
+    def expected_output(self, inputs: List[float]) -> Optional[List[float]]:
+        """
+        Override this function
+        Outputs of a perfect network for inputs, evaluated once per input of input_domain, see expected_outputs
+        """
+        return None
+
+    def __exhaustive_truth_table(self) -> Tuple[List[List[float]], Optional[np.ndarray]]:
+        # Built lazily, so worker processes that received the Neat before the first generation build their own
+        if self.__truth_table is None:
+            inputs = [list(test_input) for test_input in self.input_domain()]
+            if not inputs:
+                raise ValueError("input_domain is empty")
+            outputs = [self.expected_output(test_input) for test_input in inputs]
+            expected = None if any(output is None for output in outputs) else np.array(outputs, dtype=float)
+            self.__truth_table = (inputs, expected)
+        return self.__truth_table
+
+    @property
+    def expected_outputs(self) -> Optional[np.ndarray]:
+        """
+        (inputs x outputs) expected_output of every input of input_domain, in order, for fitness functions of the
+        'exhaustive' evaluation mode. None in the 'random' mode or when expected_output is not overridden
+        """
+        if self.__config.evaluation_mode != 'exhaustive':
+            return None
+        return self.__exhaustive_truth_table()[1]
+
+    @property
+    def __is_test_set_fixed(self) -> bool:
+        return self.__config.fixed_test_set or self.__config.evaluation_mode == 'exhaustive'
+
     def calculate_fitness(self, calculate_output: Callable[..., List[float]], hidden_nodes: int):
         inputs = self.random_input()
         return self.fitness_function(inputs, calculate_output(*inputs), hidden_nodes)
@@ -100,6 +276,8 @@ class Neat:
         """
         print('='*20)
         print(f"Generation: {self.generation}")
+        if self.__config.fitness_cache:
+            print(f"Fitness cache: {self.fitness_cache_stats['hits']} hits, {self.fitness_cache_stats['misses']} misses")
         if self.best_performer:
             print(
                 f"Best performer: {self.best_performer[1]}")
@@ -118,6 +296,9 @@ class Neat:
         print('\n'*2)
 
     def __initialise__(self, genomes: List[Genome]):
+        if not genomes:
+            # Evaluation only instances (distributed workers) have no population, leave the random state alone
+            return genomes
         inputs = [NodeGene(i+1, node_type=NodeType.INPUT) for i in range(self.__config.inputs)]
         outputs = [NodeGene(i+1+self.__config.inputs, node_type=NodeType.OUTPUT) for i in range(self.__config.outputs)]
         # connections:List[ConnectionGene] = []
@@ -137,23 +318,31 @@ class Neat:
         genome_fitness: Dict[Genome, float] = {}
         new_generation: List[Genome] = []
         species_graph:Dict[str, dict] = {}
-        fitness_sum = 0
         # print('total nodes', len(state.nodes))
         # print('total connections', len(state.connections))
         least_fit = math.inf
         most_fit = -math.inf
-        test_input = [self.random_input() for _ in range(self.__config.number_of_tests)]
+        self.__innovations.next_generation()
+        if self.__config.evaluation_mode == 'exhaustive':
+            self.__test_input = self.__exhaustive_truth_table()[0]
+        elif self.__test_input is None or not self.__config.fixed_test_set:
+            self.__test_input = [self.random_input() for _ in range(self.__config.number_of_tests)]
+        test_input = self.__test_input
         for genome in self.__population:
             genome.remove_useless_leafs()
-            fitness = [self.fitness_function(test_inp, genome.calculate_result(*test_inp), genome.hidden_node_count) for test_inp in test_input]
-            fitness = sum(fitness) / len(fitness)
+        population_fitness = self.__evaluate_population(test_input)
+        genome_species: Dict[Genome, str] = {}
+        if self.__speciation is not None:
+            for species in self.__speciation.speciate(self.__population):
+                for genome in species.members:
+                    genome_species[genome] = species.name
+        for genome, fitness in zip(self.__population, population_fitness):
             if fitness < least_fit:
                 least_fit = fitness
             if fitness > most_fit:
                 most_fit = fitness
             genome_fitness[genome] = fitness
-            fitness_sum += fitness
-            species_str = f"Species_{len(genome.node_genes)}"
+            species_str = genome_species.get(genome, f"Species_{len(genome.node_genes)}")
             if species_str not in species_graph:
                 species_graph[species_str] = {
                     'count': 0,
@@ -167,39 +356,13 @@ class Neat:
                 species_graph[species_str]['worst_fit'] = fitness
 
 
-        # select parents for baby
-        parents: List[Tuple[Genome, float]] = []
-        # print('fitness sum', fitness_sum)
-        # Comment below stuff to disable crossover
-        while len(parents) < 0.1 * len(self.__population):
-            parent = self._select_parent(fitness_sum, genome_fitness)
-            if parent not in parents:
-                parents.append(parent)
+        population_fitness = list(genome_fitness.items())
+        fitness_values = np.fromiter(genome_fitness.values(), dtype=float, count=len(population_fitness))
 
-        while len(parents) > 0:
-            if len(parents) > 1:
-                parent_a = random.choice(parents)
-                parents.remove(parent_a)
-                parent_b = random.choice(parents)
-                parents.remove(parent_b)
-            else:
-                parent_a = parents[0]
-                parents.remove(parent_a)
-                parent_b = (parent_a[0].copy(), parent_a[1])
-            more_fit = parent_a if parent_a[1] > parent_b[1] else parent_b
-            less_fit = parent_a if more_fit == parent_b else parent_b
-            baby = Genome.crossover(
-                more_fit[0], less_fit[0], equal_fitness=parent_a[1] == parent_b[1])
-            baby.mutate()
-            new_generation.append(baby)
-
-        genome_sorted = sorted(genome_fitness.items(),
-                               key=lambda x: x[1], reverse=True)
-        # print('genome sorted', genome_sorted)
-        self.__best_performer = (genome_sorted[0][0], genome_sorted[0][1])
-        self.__worst_performer = (genome_sorted[-1][0], genome_sorted[-1][1])
-        # one_fourth_fitness = genome_sorted[len(genome_sorted) // 4][1]
-        self.__average_performer = (genome_sorted[len(genome_sorted) // 2][0], genome_sorted[len(genome_sorted) // 2][1])
+        self.__best_performer = population_fitness[int(np.argmax(fitness_values))]
+        self.__worst_performer = population_fitness[int(np.argmin(fitness_values))]
+        middle = len(population_fitness) // 2
+        self.__average_performer = population_fitness[int(np.argpartition(-fitness_values, middle)[middle])]
         if (self.__overall_best_performer and self.__best_performer[1] >= self.__overall_best_performer[1]) or self.__overall_best_performer is None:
             self.__overall_best_performer = (
                 self.__best_performer[0], self.__best_performer[1])
@@ -209,50 +372,225 @@ class Neat:
             'worst': self.__worst_performer[1],
             'average': self.__average_performer[1],
             'species': species_graph,
+            'fitness_cache': self.__fitness_cache_stats,
         }
 
-        # kill 20% of population
-        genome_sorted = genome_sorted[:-int(0.2 * len(genome_sorted))]
-
-        for i, (genome, fitness) in enumerate(genome_sorted):
-            # print("Genome", genome, "conns", [conn.weight for conn in genome.connection_genes])
-            _genome = genome.copy()
-            if i > (0.1 * self.__config.population_size):
-                _genome.mutate()
-            # _genome.mutate()
-            new_generation.append(_genome)
-            if len(new_generation) >= self.__config.population_size:
-                break
+        if self.__speciation is not None:
+            quotas = self.__speciation.offspring_quotas(genome_fitness, self.__config.population_size)
+            for species in self.__speciation.species:
+                members = [(genome, genome_fitness[genome]) for genome in species.members]
+                new_generation.extend(self.__reproduce(members, quotas[species.species_id], fill=True))
+            self.__speciation.update_representatives(genome_fitness)
+        else:
+            new_generation.extend(self.__reproduce(population_fitness, self.__config.population_size))
 
         # input_nodes = [node.innovation_number for node in state.nodes if node.node_type == NodeType.INPUT]
         # output_nodes = [node.innovation_number for node in state.nodes if node.node_type == NodeType.OUTPUT]
 
         while len(new_generation) < self.__config.population_size:
-            random_baby = [Genome()]
+            random_baby = [self.__create_genome()]
             random_baby = self.__initialise__(random_baby)
-            random_baby[0].mutate()
+            self.__mutate(random_baby[0])
             new_generation.append(random_baby[0])
         
 
         # mutate babies
         # for baby in new_generation:
         #     baby.mutate()
+        if self.__weight_mutation_pending:
+            # One draw from the python random state, so seeded runs stay reproducible
+            mutate_population_weights(self.__weight_mutation_pending, np.random.default_rng(random.getrandbits(64)))
+            self.__weight_mutation_pending = []
 
         self.__generation += 1
         self.__population = new_generation
 
-    def _select_parent(self, fitness_sum: float, genome_fitness: Dict[Genome, float]):
-        lucky_number = random.uniform(0, fitness_sum)
-        running_sum = 0
-        for genome, fitness in genome_fitness.items():
-            running_sum += fitness
-            if running_sum >= lucky_number:
-                return genome, fitness
+    def __reproduce(self, population_fitness: List[Tuple[Genome, float]], size: int, fill: bool = False) -> List[Genome]:
+        """
+        Offspring of a population (or species): crossover babies, then the fittest 80% copied,
+        the top 10% of size unmutated. Returns at most size genomes, exactly size with fill, topped up with
+        mutated crossover babies of selected members (a member crossed with itself when it is the only one).
+        """
+        offspring: List[Genome] = []
+        if size <= 0 or not population_fitness:
+            return offspring
+        fitness_values = np.fromiter((fitness for _, fitness in population_fitness), dtype=float, count=len(population_fitness))
+
+        # select parents for baby
+        # Comment below stuff to disable crossover
+        selection = self._create_selection(fitness_values.tolist())
+        parents: List[Tuple[Genome, float]] = [
+            population_fitness[i] for i in selection.select(math.ceil(0.1 * len(population_fitness)))
+        ]
+
+        pairs: List[Tuple[Genome, Genome]] = []
+        while len(parents) > 0 and len(pairs) < size:
+            if len(parents) > 1:
+                parent_a = random.choice(parents)
+                parents.remove(parent_a)
+                parent_b = random.choice(parents)
+                parents.remove(parent_b)
+            else:
+                parent_a = parents[0]
+                parents.remove(parent_a)
+                parent_b = (parent_a[0].copy(), parent_a[1])
+            more_fit = parent_a if parent_a[1] > parent_b[1] else parent_b
+            less_fit = parent_a if more_fit == parent_b else parent_b
+            pairs.append((more_fit[0], less_fit[0]))
+        for baby in self.__genome_class.crossover_many(pairs):
+            self.__mutate(baby)
+            offspring.append(baby)
+
+        # kill 20% of population, the quota can take fewer survivors. Only the elites that are kept
+        # unmutated need to be in fitness order, the others are the fittest of the rest in any order
+        survivor_count = len(population_fitness) - int(0.2 * len(population_fitness))
+        take = min(survivor_count, size - len(offspring))
+        survivors = select_fittest(fitness_values, take, sorted_count=int(0.1 * size) + 1)
+
+        for i, (genome, fitness) in enumerate(population_fitness[j] for j in survivors):
+            # print("Genome", genome, "conns", [conn.weight for conn in genome.connection_genes])
+            _genome = genome.copy()
+            if i > (0.1 * size):
+                self.__mutate(_genome)
+            # _genome.mutate()
+            offspring.append(_genome)
+
+        fill_pairs: List[Tuple[Genome, Genome]] = []
+        while fill and len(offspring) + len(fill_pairs) < size:
+            # Parents are distinct within one draw, so a draw pairs up at most every member once
+            selected = selection.select(2 * (size - len(offspring) - len(fill_pairs)))
+            if len(selected) == 1:
+                selected = selected * 2
+            for pair in zip(selected[0::2], selected[1::2]):
+                more_fit, less_fit = sorted(pair, key=lambda i: fitness_values[i], reverse=True)
+                fill_pairs.append((population_fitness[more_fit][0], population_fitness[less_fit][0]))
+        for baby in self.__genome_class.crossover_many(fill_pairs):
+            self.__mutate(baby)
+            offspring.append(baby)
+        return offspring
+
+    def evaluate_networks(self, networks: List[FeedForwardNetwork], hidden_nodes: List[int], test_input: List[List[float]]) -> List[float]:
+        """
+        Average fitness of every network over the test inputs, runs in worker processes too
+        """
+        return self.__evaluate_outputs(PopulationEvaluator.create(networks), hidden_nodes, test_input)
+
+    def __evaluate_outputs(self, evaluator: PopulationEvaluator, hidden_nodes: List[int], test_input: List[List[float]]) -> List[float]:
+        inputs = np.array(test_input, dtype=float)
+        population_outputs = evaluator.evaluate(inputs)
+        if self.is_batch_fitness:
+            fitness = self.fitness_batch(inputs, population_outputs, np.array(hidden_nodes, dtype=np.int64))
+            return np.mean(fitness, axis=1).tolist()
+        population_outputs = population_outputs.tolist()
+        if self.is_async_fitness:
+            return asyncio.run(self.__evaluate_outputs_async(population_outputs, hidden_nodes, test_input))
+        population_fitness = []
+        for outputs, hidden in zip(population_outputs, hidden_nodes):
+            fitness = [self.fitness_function(test_inp, output, hidden) for test_inp, output in zip(test_input, outputs)]
+            population_fitness.append(sum(fitness) / len(fitness))
+        return population_fitness
+
+    @property
+    def is_async_fitness(self) -> bool:
+        return inspect.iscoroutinefunction(self.fitness_function)
+
+    async def __evaluate_outputs_async(self, population_outputs: List[List[List[float]]], hidden_nodes: List[int], test_input: List[List[float]]) -> List[float]:
+        semaphore = asyncio.Semaphore(self.__config.async_concurrency)
+
+        async def limited_fitness(test_inp: List[float], output: List[float], hidden: int) -> float:
+            async with semaphore:
+                return await self.fitness_function(test_inp, output, hidden)
+
+        async def genome_fitness(outputs: List[List[float]], hidden: int) -> float:
+            fitness = await asyncio.gather(*[limited_fitness(test_inp, output, hidden) for test_inp, output in zip(test_input, outputs)])
+            return sum(fitness) / len(fitness)
+
+        return list(await asyncio.gather(*[genome_fitness(outputs, hidden) for outputs, hidden in zip(population_outputs, hidden_nodes)]))
+
+    def __evaluate_population(self, test_input: List[List[float]]) -> List[float]:
+        if not self.__config.fitness_cache:
+            return self.__evaluate_genomes(self.__population, test_input)
+        population_fitness: List[Optional[float]] = []
+        missing: Dict[bytes, List[int]] = {}
+        for i, genome in enumerate(self.__population):
+            cached = self.__fitness_cache.get(genome.fingerprint, None)
+            if cached is not None and (self.__is_test_set_fixed or self.generation - cached[1] <= self.__config.fitness_cache_max_age):
+                population_fitness.append(cached[0])
+            else:
+                population_fitness.append(None)
+                missing.setdefault(genome.fingerprint, []).append(i)
+        # Identical genomes of a generation are evaluated once
+        evaluated = self.__evaluate_genomes([self.__population[indices[0]] for indices in missing.values()], test_input)
+        for indices, fitness in zip(missing.values(), evaluated):
+            for i in indices:
+                population_fitness[i] = fitness
+        self.__fitness_cache_stats = {'hits': len(self.__population) - len(missing), 'misses': len(missing)}
+        # Keep entries of the current population only
+        fitness_cache: Dict[bytes, Tuple[float, int]] = {}
+        for genome, fitness in zip(self.__population, population_fitness):
+            cached = self.__fitness_cache.get(genome.fingerprint, None)
+            if genome.fingerprint in missing or cached is None:
+                cached = (fitness, self.generation)
+            fitness_cache[genome.fingerprint] = cached
+        self.__fitness_cache = fitness_cache
+        return population_fitness
+
+    def __evaluate_genomes(self, genomes: List[Genome], test_input: List[List[float]]) -> List[float]:
+        if not genomes:
+            return []
+        hidden_nodes = [genome.hidden_node_count for genome in genomes]
+        arena = shared_arena(genomes) if self.__coordinator is None and self.__executor is None else None
+        if arena is not None:
+            # Read straight from the arena columns, no network is compiled per genome
+            return self.__evaluate_outputs(arena.evaluator(arena_slots(genomes)), hidden_nodes, test_input)
+        networks = [genome.network for genome in genomes]
+        if self.__coordinator is not None:
+            try:
+                return self.__coordinator.evaluate(
+                    type(self), self.__config, networks, hidden_nodes, test_input,
+                    chunk_size=self.__config.worker_chunk_size or 64, timeout=self.__config.coordinator_timeout)
+            except TimeoutError as e:
+                print(f"{e}, evaluating generation {self.generation} locally")
+        if self.__executor is None:
+            return self.evaluate_networks(networks, hidden_nodes, test_input)
+        chunk_size = self.__config.worker_chunk_size or math.ceil(len(networks) / (self.__config.workers * 4))
+        chunks = range(0, len(networks), chunk_size)
+        results = self.__executor.map(
+            _evaluate_worker_chunk,
+            [networks[i:i + chunk_size] for i in chunks],
+            [hidden_nodes[i:i + chunk_size] for i in chunks],
+            [test_input for _ in chunks],
+        )
+        return [fitness for chunk_fitness in results for fitness in chunk_fitness]
+
+    def _create_selection(self, fitness: List[float]) -> Selection:
+        if self.__config.selection == 'tournament':
+            return TournamentSelection(fitness, tournament_size=self.__config.tournament_size)
+        return RouletteSelection(fitness)
 
     def run(self, iterations: int):
         if self.__running:
             return
         self.__running = True
+        if self.__config.coordinator is not None:
+            with Coordinator(*self.__config.coordinator, heartbeat_timeout=self.__config.heartbeat_timeout) as coordinator:
+                self.__coordinator = coordinator
+                try:
+                    self.__run(iterations)
+                finally:
+                    self.__coordinator = None
+        # The event loop already overlaps async fitness calls, the process pool is only used for sync ones
+        elif self.__config.workers > 1 and (self.is_batch_fitness or not self.is_async_fitness):
+            with ProcessPoolExecutor(max_workers=self.__config.workers, initializer=_initialise_worker, initargs=(self,)) as executor:
+                self.__executor = executor
+                try:
+                    self.__run(iterations)
+                finally:
+                    self.__executor = None
+        else:
+            self.__run(iterations)
+
+    def __run(self, iterations: int):
         for i in range(iterations):
             self.every_generation()
             self.__iteration()
@@ -0,0 +1,378 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.array_genome import ArrayGenome
+from src.gene_store import DEFAULT_REGISTRY, InnovationRegistry
+from src.genome import Genome
+from src.population_evaluator import PopulationEvaluator
+
+NODE_COLUMNS = {
+    'node_ids': np.int64,
+    'node_types': np.int8,
+    'node_x_axis': np.float64,
+    'node_weights': np.float64,
+}
+CONNECTION_COLUMNS = {
+    'connection_innovations': np.int64,
+    'connection_from': np.int64,
+    'connection_to': np.int64,
+    'connection_weights': np.float64,
+    'connection_enabled': np.bool_,
+}
+
+
+class _BlockColumns:
+    """
+    Growable columns handed out in blocks of power of two capacities.
+    Released blocks go to a free-list per capacity, so same sized genomes reuse each other's rows.
+    """
+
+    def __init__(self, dtypes: Dict[str, type], capacity: int) -> None:
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self.capacity = capacity
+        # Rows past end have never been handed out
+        self.end = 0
+        self.free: Dict[int, List[int]] = {}
+
+    def allocate(self, size: int) -> Tuple[int, int]:
+        capacity = 1 << max(0, size - 1).bit_length()
+        offsets = self.free.get(capacity)
+        if offsets:
+            return offsets.pop(), capacity
+        offset = self.end
+        self.end += capacity
+        if self.end > self.capacity:
+            self.capacity = max(2 * self.capacity, self.end)
+            for name, column in self.columns.items():
+                grown = np.zeros(self.capacity, dtype=column.dtype)
+                grown[:len(column)] = column
+                self.columns[name] = grown
+        return offset, capacity
+
+    def release(self, offset: int, capacity: int):
+        self.free.setdefault(capacity, []).append(offset)
+
+    @property
+    def free_rows(self) -> int:
+        return sum(capacity * len(offsets) for capacity, offsets in self.free.items())
+
+
+class ArenaGenes:
+    """
+    Genes of one ArrayGenome stored in a PopulationArena, columns are views into the arena
+    The views are only valid until the arena grows, they are looked up again on every access
+    """
+    __slots__ = ('arena', 'slot')
+
+    def __init__(self, arena: 'PopulationArena', slot: int) -> None:
+        self.arena = arena
+        self.slot = slot
+
+    @property
+    def version(self) -> int:
+        return self.arena.slot_version(self.slot)
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        return self.arena.node_column(self.slot, 'node_ids')
+
+    @property
+    def node_types(self) -> np.ndarray:
+        return self.arena.node_column(self.slot, 'node_types')
+
+    @property
+    def node_x_axis(self) -> np.ndarray:
+        return self.arena.node_column(self.slot, 'node_x_axis')
+
+    @property
+    def node_weights(self) -> np.ndarray:
+        return self.arena.node_column(self.slot, 'node_weights')
+
+    @property
+    def connection_innovations(self) -> np.ndarray:
+        return self.arena.connection_column(self.slot, 'connection_innovations')
+
+    @property
+    def connection_from(self) -> np.ndarray:
+        return self.arena.connection_column(self.slot, 'connection_from')
+
+    @property
+    def connection_to(self) -> np.ndarray:
+        return self.arena.connection_column(self.slot, 'connection_to')
+
+    @property
+    def connection_weights(self) -> np.ndarray:
+        return self.arena.connection_column(self.slot, 'connection_weights')
+
+    @property
+    def connection_enabled(self) -> np.ndarray:
+        return self.arena.connection_column(self.slot, 'connection_enabled')
+
+    def append_node(self, innovation_number: int, node_type: int, x_axis: float, weight: float):
+        self.arena.append_node(self.slot, (innovation_number, node_type, x_axis, weight))
+
+    def append_connection(self, innovation_number: int, from_node: int, to_node: int, weight: float, enabled: bool):
+        self.arena.append_connection(self.slot, (innovation_number, from_node, to_node, weight, enabled))
+
+    def keep(self, node_mask: np.ndarray, connection_mask: np.ndarray):
+        self.arena.keep(self.slot, node_mask, connection_mask)
+
+    def copy(self) -> 'ArenaGenes':
+        return ArenaGenes(self.arena, self.arena.copy_slot(self.slot))
+
+    def __del__(self):
+        # The genome was culled, its blocks go back to the free-lists
+        self.arena.release(self.slot)
+
+
+class PopulationArena:
+    """
+    Genes of every ArrayGenome of a run in shared, growable column arrays.
+    Every genome is a slot owning a node block and a connection block, rows offset:offset+length of the columns.
+    Blocks of released slots (culled genomes) are reused through free-lists, so a run allocates few new arrays.
+    Population wide operations work on all live connection rows at once, see live_connection_rows.
+    """
+
+    def __init__(self, node_capacity: int = 1024, connection_capacity: int = 4096, slot_capacity: int = 256) -> None:
+        self.__nodes = _BlockColumns(NODE_COLUMNS, node_capacity)
+        self.__connections = _BlockColumns(CONNECTION_COLUMNS, connection_capacity)
+        # Per slot: node offset, capacity and length, then the same for connections
+        self.__blocks = np.zeros((slot_capacity, 6), dtype=np.int64)
+        self.__versions = np.zeros(slot_capacity, dtype=np.int64)
+        self.__live = np.zeros(slot_capacity, dtype=bool)
+        self.__free_slots: List[int] = []
+        self.__slot_end = 0
+
+    @property
+    def genome_count(self) -> int:
+        return int(np.count_nonzero(self.__live[:self.__slot_end]))
+
+    @property
+    def free_rows(self) -> Tuple[int, int]:
+        """
+        Node and connection rows waiting on the free-lists
+        """
+        return self.__nodes.free_rows, self.__connections.free_rows
+
+    @property
+    def connection_weights(self) -> np.ndarray:
+        """
+        Weight column of every connection row, index it with live_connection_rows
+        """
+        return self.__connections.columns['connection_weights']
+
+    def column(self, name: str) -> np.ndarray:
+        if name in NODE_COLUMNS:
+            return self.__nodes.columns[name]
+        return self.__connections.columns[name]
+
+    def allocate(self, node_count: int = 0, connection_count: int = 0) -> int:
+        if self.__free_slots:
+            slot = self.__free_slots.pop()
+        else:
+            slot = self.__slot_end
+            self.__slot_end += 1
+            if slot == len(self.__live):
+                self.__blocks = np.concatenate([self.__blocks, np.zeros_like(self.__blocks)])
+                self.__versions = np.concatenate([self.__versions, np.zeros_like(self.__versions)])
+                self.__live = np.concatenate([self.__live, np.zeros_like(self.__live)])
+        node_offset, node_capacity = self.__nodes.allocate(node_count)
+        connection_offset, connection_capacity = self.__connections.allocate(connection_count)
+        self.__blocks[slot] = (node_offset, node_capacity, node_count, connection_offset, connection_capacity, connection_count)
+        self.__live[slot] = True
+        return slot
+
+    def create_genes(self) -> ArenaGenes:
+        return ArenaGenes(self, self.allocate())
+
+    def release(self, slot: int):
+        if not self.__live[slot]:
+            return
+        node_offset, node_capacity, _, connection_offset, connection_capacity, _ = self.__blocks[slot].tolist()
+        self.__nodes.release(node_offset, node_capacity)
+        self.__connections.release(connection_offset, connection_capacity)
+        self.__live[slot] = False
+        # Caches of a genome that gets the slot next must not match
+        self.__versions[slot] += 1
+        self.__free_slots.append(slot)
+
+    def slot_version(self, slot: int) -> int:
+        return int(self.__versions[slot])
+
+    def node_column(self, slot: int, name: str) -> np.ndarray:
+        offset, _, length = self.__blocks[slot, :3].tolist()
+        return self.__nodes.columns[name][offset:offset + length]
+
+    def connection_column(self, slot: int, name: str) -> np.ndarray:
+        offset, _, length = self.__blocks[slot, 3:].tolist()
+        return self.__connections.columns[name][offset:offset + length]
+
+    def __append(self, columns: _BlockColumns, slot: int, block: int, values: tuple):
+        offset, capacity, length = self.__blocks[slot, block:block + 3].tolist()
+        if length == capacity:
+            # Block is full, move the rows to a block twice the size
+            new_offset, new_capacity = columns.allocate(length + 1)
+            for column in columns.columns.values():
+                column[new_offset:new_offset + length] = column[offset:offset + length]
+            columns.release(offset, capacity)
+            offset, capacity = new_offset, new_capacity
+        for column, value in zip(columns.columns.values(), values):
+            column[offset + length] = value
+        self.__blocks[slot, block:block + 3] = (offset, capacity, length + 1)
+
+    def append_node(self, slot: int, values: tuple):
+        """
+        @param values: (id, type, x_axis, weight)
+        """
+        self.__append(self.__nodes, slot, 0, values)
+
+    def append_connection(self, slot: int, values: tuple):
+        """
+        @param values: (innovation, from, to, weight, enabled)
+        """
+        self.__append(self.__connections, slot, 3, values)
+
+    def keep(self, slot: int, node_mask: np.ndarray, connection_mask: np.ndarray):
+        """
+        Keep the masked rows of a slot, in order
+        """
+        for columns, block, mask in ((self.__nodes, 0, node_mask), (self.__connections, 3, connection_mask)):
+            offset, _, length = self.__blocks[slot, block:block + 3].tolist()
+            kept = int(np.count_nonzero(mask))
+            for column in columns.columns.values():
+                column[offset:offset + kept] = column[offset:offset + length][mask]
+            self.__blocks[slot, block + 2] = kept
+
+    def copy_slot(self, slot: int) -> int:
+        node_offset, _, node_count, connection_offset, _, connection_count = self.__blocks[slot].tolist()
+        copy = self.allocate(node_count, connection_count)
+        new_node_offset, _, _, new_connection_offset, _, _ = self.__blocks[copy].tolist()
+        for column in self.__nodes.columns.values():
+            column[new_node_offset:new_node_offset + node_count] = column[node_offset:node_offset + node_count]
+        for column in self.__connections.columns.values():
+            column[new_connection_offset:new_connection_offset + connection_count] = column[connection_offset:connection_offset + connection_count]
+        return copy
+
+    def live_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.__live[:self.__slot_end])
+
+    def __rows(self, slots: np.ndarray, block: int) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = self.__blocks[slots, block]
+        lengths = self.__blocks[slots, block + 2]
+        positions = np.repeat(np.arange(len(slots)), lengths)
+        starts = np.repeat(offsets - (np.cumsum(lengths) - lengths), lengths)
+        return starts + np.arange(len(positions)), positions
+
+    def node_rows(self, slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Node rows of the given slots, in slot order
+        @returns (rows, position in slots of the slot of every row)
+        """
+        return self.__rows(slots, 0)
+
+    def connection_rows(self, slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Connection rows of the given slots, in slot order
+        @returns (rows, position in slots of the slot of every row)
+        """
+        return self.__rows(slots, 3)
+
+    def live_connection_rows(self, slots: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Connection rows of the given (default every live) slot, in slot order
+        @returns (rows, slot of every row)
+        """
+        if slots is None:
+            slots = self.live_slots()
+        rows, positions = self.connection_rows(slots)
+        return rows, slots[positions]
+
+    def evaluator(self, slots: np.ndarray) -> PopulationEvaluator:
+        """
+        PopulationEvaluator of the genomes of the given slots, read from the columns without compiling a network per genome
+        """
+        node_rows, node_genomes = self.node_rows(slots)
+        connection_rows, connection_genomes = self.connection_rows(slots)
+        nodes = self.__nodes.columns
+        connections = self.__connections.columns
+        return PopulationEvaluator.from_arrays(
+            len(slots),
+            node_genomes, nodes['node_ids'][node_rows], nodes['node_types'][node_rows], nodes['node_x_axis'][node_rows],
+            connection_genomes, connections['connection_from'][connection_rows], connections['connection_to'][connection_rows],
+            connections['connection_weights'][connection_rows], connections['connection_enabled'][connection_rows],
+        )
+
+    def touch(self, slots: np.ndarray):
+        """
+        Mark slots as changed after writing to their rows directly, so their genomes drop their caches
+        """
+        np.add.at(self.__versions, slots, 1)
+
+    def to_dict(self, slots: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Genes of the given (default every live) slot as compact arrays, e.g. for np.savez
+        """
+        if slots is None:
+            slots = self.live_slots()
+        data: Dict[str, np.ndarray] = {
+            'node_counts': self.__blocks[slots, 2].copy(),
+            'connection_counts': self.__blocks[slots, 5].copy(),
+        }
+        node_rows, _ = self.node_rows(slots)
+        for name, column in self.__nodes.columns.items():
+            data[name] = column[node_rows]
+        connection_rows, _ = self.live_connection_rows(slots)
+        for name, column in self.__connections.columns.items():
+            data[name] = column[connection_rows]
+        return data
+
+    @staticmethod
+    def from_dict(data: Dict[str, np.ndarray], registry: Optional[InnovationRegistry] = None) -> Tuple['PopulationArena', List[ArrayGenome]]:
+        """
+        Arena and its genomes back from to_dict, the arena is packed without free rows
+        """
+        node_counts = np.asarray(data['node_counts'])
+        connection_counts = np.asarray(data['connection_counts'])
+        arena = PopulationArena(
+            node_capacity=max(1, int(node_counts.sum())),
+            connection_capacity=max(1, int(connection_counts.sum())),
+            slot_capacity=max(1, len(node_counts)),
+        )
+        if registry is None:
+            registry = DEFAULT_REGISTRY
+        # Innovations are per registry, the connections are numbered again by the one they are loaded into
+        innovations = np.array([
+            registry.connection_innovation(from_node, to_node)
+            for from_node, to_node in zip(np.asarray(data['connection_from']).tolist(), np.asarray(data['connection_to']).tolist())
+        ], dtype=np.int64)
+        genomes: List[ArrayGenome] = []
+        node_start, connection_start = 0, 0
+        for node_count, connection_count in zip(node_counts.tolist(), connection_counts.tolist()):
+            slot = arena.allocate(node_count, connection_count)
+            for name in NODE_COLUMNS:
+                arena.node_column(slot, name)[:] = data[name][node_start:node_start + node_count]
+            for name in CONNECTION_COLUMNS:
+                values = innovations if name == 'connection_innovations' else data[name]
+                arena.connection_column(slot, name)[:] = values[connection_start:connection_start + connection_count]
+            genomes.append(ArrayGenome.from_genes(ArenaGenes(arena, slot), registry))
+            node_start += node_count
+            connection_start += connection_count
+        return arena, genomes
+
+
+def shared_arena(genomes: Sequence[Genome]) -> Optional[PopulationArena]:
+    """
+    Arena holding the genes of every genome, None when they are not all in the same one
+    """
+    arenas = {id(genes.arena): genes.arena for genes in (getattr(genome, 'genes', None) for genome in genomes) if isinstance(genes, ArenaGenes)}
+    if len(arenas) != 1 or not all(isinstance(getattr(genome, 'genes', None), ArenaGenes) for genome in genomes):
+        return None
+    return next(iter(arenas.values()))
+
+
+def arena_slots(genomes: Sequence[ArrayGenome]) -> np.ndarray:
+    """
+    Slot of every genome of shared_arena, in order
+    """
+    return np.fromiter((genome.genes.slot for genome in genomes), dtype=np.intp, count=len(genomes))
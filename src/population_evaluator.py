@@ -0,0 +1,172 @@
+from typing import List
+
+import numpy as np
+
+from src.feed_forward import FeedForwardNetwork
+from utils.enums import NodeType
+
+
+class PopulationEvaluator:
+    """
+    Packs the compiled networks of a whole population into one block-sparse network.
+    Slots of genome g live in genome_slot_offsets[g]:genome_slot_offsets[g+1], edges are
+    one global list ordered by a level schedule shared by every genome: level l of the
+    schedule holds the l-th x_axis level of every genome and its edges live in
+    level_offsets[l]:level_offsets[l+1].
+    """
+
+    def __init__(self, input_slots: np.ndarray, output_slots: np.ndarray, genome_slot_offsets: np.ndarray, edge_sources: np.ndarray, edge_weights: np.ndarray, edge_targets: np.ndarray, level_offsets: np.ndarray) -> None:
+        self.input_slots = input_slots
+        self.output_slots = output_slots
+        self.genome_slot_offsets = genome_slot_offsets
+        self.edge_sources = edge_sources
+        self.edge_weights = edge_weights
+        self.edge_targets = edge_targets
+        self.level_offsets = level_offsets
+
+    @property
+    def genome_count(self) -> int:
+        return len(self.genome_slot_offsets) - 1
+
+    @property
+    def slot_count(self) -> int:
+        return int(self.genome_slot_offsets[-1])
+
+    @staticmethod
+    def create(networks: List[FeedForwardNetwork]) -> 'PopulationEvaluator':
+        if not networks:
+            raise ValueError("Cannot create an evaluator for an empty population")
+        input_count = len(networks[0].input_slots)
+        output_count = len(networks[0].output_slots)
+        slot_offsets = np.zeros(len(networks) + 1, dtype=np.intp)
+        input_slots: List[List[int]] = []
+        output_slots: List[List[int]] = []
+        sources: List[np.ndarray] = []
+        weights: List[np.ndarray] = []
+        targets: List[np.ndarray] = []
+        levels: List[np.ndarray] = []
+        for i, network in enumerate(networks):
+            if len(network.input_slots) != input_count or len(network.output_slots) != output_count:
+                raise ValueError("Every genome must have the same number of input and output nodes")
+            base = int(slot_offsets[i])
+            slot_offsets[i + 1] = base + network.slot_count
+            input_slots.append([base + slot for slot in network.input_slots])
+            output_slots.append([base + slot for slot in network.output_slots])
+            network_sources, network_weights, network_targets = network.arrays
+            level_edge_offsets = np.array(network.edge_offsets, dtype=np.intp)[network.level_bounds]
+            sources.append(network_sources + base)
+            weights.append(network_weights)
+            targets.append(network_targets + base)
+            levels.append(np.repeat(np.arange(len(network.level_bounds) - 1), np.diff(level_edge_offsets)))
+
+        edge_levels = np.concatenate(levels)
+        # stable, so edges keep their genome and per-node order inside a level
+        schedule = np.argsort(edge_levels, kind='stable')
+        level_count = max(len(network.level_bounds) - 1 for network in networks)
+        level_offsets = np.searchsorted(edge_levels[schedule], np.arange(level_count + 1))
+
+        return PopulationEvaluator(
+            input_slots=np.array(input_slots, dtype=np.intp).reshape(len(networks), input_count),
+            output_slots=np.array(output_slots, dtype=np.intp).reshape(len(networks), output_count),
+            genome_slot_offsets=slot_offsets,
+            edge_sources=np.concatenate(sources)[schedule],
+            edge_weights=np.concatenate(weights)[schedule],
+            edge_targets=np.concatenate(targets)[schedule],
+            level_offsets=level_offsets,
+        )
+
+    @staticmethod
+    def from_arrays(genome_count: int, node_genomes: np.ndarray, node_ids: np.ndarray, node_types: np.ndarray, node_x_axis: np.ndarray, connection_genomes: np.ndarray, connection_from: np.ndarray, connection_to: np.ndarray, connection_weights: np.ndarray, connection_enabled: np.ndarray) -> 'PopulationEvaluator':
+        """
+        Same evaluator as create over FeedForwardNetwork.from_arrays of every genome, built from the parallel
+        gene arrays of the whole population at once. node_genomes and connection_genomes hold the genome of every row
+        """
+        if not genome_count:
+            raise ValueError("Cannot create an evaluator for an empty population")
+        # Slots are genome major, then in x_axis and innovation order like FeedForwardNetwork
+        order = np.lexsort((node_ids, node_x_axis, node_genomes))
+        node_genomes, node_ids, node_types, node_x_axis = node_genomes[order], node_ids[order], node_types[order], node_x_axis[order]
+        slot_offsets = np.zeros(genome_count + 1, dtype=np.intp)
+        np.cumsum(np.bincount(node_genomes, minlength=genome_count), out=slot_offsets[1:])
+
+        enabled = np.flatnonzero(connection_enabled)
+        edge_genomes = connection_genomes[enabled]
+        endpoints = PopulationEvaluator.__slots_of(
+            node_genomes, node_ids, np.concatenate([edge_genomes, edge_genomes]), np.concatenate([connection_from[enabled], connection_to[enabled]]))
+        sources, targets = endpoints[:len(enabled)], endpoints[len(enabled):]
+        is_input = node_types == NodeType.INPUT
+        # Inputs are never evaluated, edges into them are dropped. Edges of a node keep their gene order
+        keep = ~is_input[targets]
+        edge_order = np.flatnonzero(keep)[np.argsort(targets[keep], kind='stable')]
+        sources, targets, weights = sources[edge_order], targets[edge_order], connection_weights[enabled][edge_order]
+
+        # Level of every evaluated node in its genome, a level starts where the x_axis or the genome changes
+        node_slots = np.flatnonzero(~is_input)
+        slot_genomes = node_genomes[node_slots]
+        genome_starts = np.ones(len(node_slots), dtype=bool)
+        genome_starts[1:] = np.diff(slot_genomes) != 0
+        level_starts = genome_starts.copy()
+        level_starts[1:] |= np.diff(node_x_axis[node_slots]) != 0
+        levels = np.cumsum(level_starts) - 1
+        levels -= np.maximum.accumulate(np.where(genome_starts, levels, 0))
+        slot_levels = np.zeros(len(node_ids), dtype=np.intp)
+        slot_levels[node_slots] = levels
+        edge_levels = slot_levels[targets]
+        # stable, so edges keep their genome and per-node order inside a level
+        schedule = np.argsort(edge_levels, kind='stable')
+        level_count = int(levels.max()) + 1 if len(levels) else 0
+        level_offsets = np.searchsorted(edge_levels[schedule], np.arange(level_count + 1))
+
+        return PopulationEvaluator(
+            input_slots=PopulationEvaluator.__genome_slots(node_genomes, is_input, genome_count),
+            output_slots=PopulationEvaluator.__genome_slots(node_genomes, node_types == NodeType.OUTPUT, genome_count),
+            genome_slot_offsets=slot_offsets,
+            edge_sources=sources[schedule],
+            edge_weights=weights[schedule],
+            edge_targets=targets[schedule],
+            level_offsets=level_offsets,
+        )
+
+    @staticmethod
+    def __slots_of(node_genomes: np.ndarray, node_ids: np.ndarray, genomes: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        # (genome, node) pairs as one integer key, looked up in the sorted keys of every slot
+        key_base = int(max(node_ids.max(initial=0), nodes.max(initial=0))) + 1
+        slot_keys = node_genomes.astype(np.int64) * key_base + node_ids
+        key_order = np.argsort(slot_keys, kind='stable')
+        sorted_keys = slot_keys[key_order]
+        keys = genomes.astype(np.int64) * key_base + nodes
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), max(len(sorted_keys) - 1, 0))
+        if len(keys) and (not len(sorted_keys) or np.any(sorted_keys[positions] != keys)):
+            missing = int(nodes[sorted_keys[positions] != keys][0]) if len(sorted_keys) else int(nodes[0])
+            raise ValueError(f"Invalid connection, node {missing} is not in the genome")
+        return key_order[positions]
+
+    @staticmethod
+    def __genome_slots(node_genomes: np.ndarray, mask: np.ndarray, genome_count: int) -> np.ndarray:
+        slots = np.flatnonzero(mask)
+        counts = np.bincount(node_genomes[slots], minlength=genome_count)
+        if np.any(counts != counts[0]):
+            raise ValueError("Every genome must have the same number of input and output nodes")
+        return slots.reshape(genome_count, int(counts[0]))
+
+    def evaluate(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every genome against the same (n_tests x n_inputs) matrix
+        @returns (n_genomes x n_tests x n_outputs) matrix
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.ndim != 2 or inputs.shape[1] != self.input_slots.shape[1]:
+            raise ValueError(
+                "Number of inputs does not match number of input nodes")
+        values = np.zeros((self.slot_count, inputs.shape[0]))
+        values[self.input_slots.ravel()] = np.tile(inputs.T, (self.genome_count, 1))
+        for level in range(len(self.level_offsets) - 1):
+            start, end = self.level_offsets[level], self.level_offsets[level + 1]
+            if start == end:
+                continue
+            np.add.at(
+                values,
+                self.edge_targets[start:end],
+                values[self.edge_sources[start:end]] * self.edge_weights[start:end, None],
+            )
+        return values[self.output_slots].transpose(0, 2, 1)
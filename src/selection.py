@@ -0,0 +1,90 @@
+import bisect
+import random
+from itertools import accumulate
+from typing import List, Sequence
+
+import numpy as np
+
+
+class Selection:
+    """
+    Draws distinct parents from a population, selected values are indices into the fitness sequence
+    """
+
+    def __init__(self, fitness: Sequence[float]) -> None:
+        self.fitness = list(fitness)
+
+    def select(self, count: int) -> List[int]:
+        raise NotImplementedError
+
+
+class RouletteSelection(Selection):
+    """
+    Fitness proportionate selection, every draw is a bisect on the cumulative fitness
+    """
+
+    def select(self, count: int) -> List[int]:
+        count = min(count, len(self.fitness))
+        candidates = list(range(len(self.fitness)))
+        cumulative = list(accumulate(self.fitness))
+        selected: List[int] = []
+        chosen = set()
+        repeats = 0
+        while len(selected) < count:
+            lucky_number = random.uniform(0, cumulative[-1])
+            index = candidates[min(bisect.bisect_left(cumulative, lucky_number), len(cumulative) - 1)]
+            if index not in chosen:
+                chosen.add(index)
+                selected.append(index)
+                repeats = 0
+                continue
+            repeats += 1
+            if repeats > len(candidates):
+                # Fitness is skewed towards the already selected genomes, draw from the rest only
+                candidates = [candidate for candidate in candidates if candidate not in chosen]
+                cumulative = list(accumulate(self.fitness[candidate] for candidate in candidates))
+                repeats = 0
+        return selected
+
+
+class TournamentSelection(Selection):
+    """
+    Fittest of tournament_size random genomes wins, winners do not enter later tournaments
+    """
+
+    def __init__(self, fitness: Sequence[float], tournament_size: int = 3) -> None:
+        super().__init__(fitness)
+        if tournament_size < 1:
+            raise ValueError("tournament_size must be at least 1")
+        self.tournament_size = tournament_size
+
+    def select(self, count: int) -> List[int]:
+        count = min(count, len(self.fitness))
+        candidates = list(range(len(self.fitness)))
+        selected: List[int] = []
+        while len(selected) < count:
+            entrants = random.sample(range(len(candidates)), min(self.tournament_size, len(candidates)))
+            winner = max(entrants, key=lambda position: self.fitness[candidates[position]])
+            selected.append(candidates[winner])
+            candidates[winner] = candidates[-1]
+            candidates.pop()
+        return selected
+
+
+def select_fittest(fitness: np.ndarray, count: int, sorted_count: int = 0) -> np.ndarray:
+    """
+    Indices of the count fittest genomes found by partial selection
+    Only the first sorted_count of them are ordered, fittest first
+    """
+    count = min(count, len(fitness))
+    sorted_count = min(sorted_count, count)
+    if count <= 0:
+        return np.zeros(0, dtype=np.intp)
+    fittest = np.argpartition(-fitness, count - 1)[:count] if count < len(fitness) else np.arange(count)
+    if sorted_count <= 0:
+        return fittest
+    if sorted_count < count:
+        fittest = fittest[np.argpartition(-fitness[fittest], sorted_count - 1)]
+    head = fittest[:sorted_count]
+    head = head[np.argsort(-fitness[head], kind='stable')]
+    return np.concatenate([head, fittest[sorted_count:]])
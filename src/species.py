@@ -0,0 +1,132 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.distance import population_distance_matrix
+from src.genome import Genome
+
+
+class Species:
+    def __init__(self, species_id: int, representative: Genome) -> None:
+        self.species_id = species_id
+        self.representative = representative
+        self.members: List[Genome] = []
+
+    @property
+    def name(self) -> str:
+        return f"Species_{self.species_id}"
+
+
+class Speciation:
+    """
+    Groups genomes into species by Genome.distance to each species' representative.
+    The compatibility threshold moves towards target_species every generation, starting by threshold_step. The step
+    grows by half every generation the species count stays on the same side of target_species and halves when it
+    crosses it, so a badly chosen initial threshold is corrected in a few generations and then tuned finely.
+    Distances are cached by (genome, representative) fingerprint, unchanged genomes like copied elites are
+    not measured again against a representative that did not change. cache_hits and cache_misses count
+    (genome, representative) pairs of the last speciate call.
+    """
+
+    def __init__(self, compatibility_threshold: float = 3.0, target_species: int = 10, threshold_step: float = 0.1, min_threshold: float = 0.1) -> None:
+        self.compatibility_threshold = compatibility_threshold
+        self.target_species = target_species
+        self.threshold_step = threshold_step
+        self.min_threshold = min_threshold
+        self.species: List[Species] = []
+        # Current threshold step and the direction it moved in last generation, -1, 0 or 1
+        self.__step = threshold_step
+        self.__direction = 0
+        self.__next_species_id = 1
+        self.__distance_cache: Dict[Tuple[bytes, bytes], float] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __distances(self, genomes: Sequence[Genome], representatives: Sequence[Genome]) -> List[List[float]]:
+        distances: List[List[Optional[float]]] = [
+            [self.__distance_cache.get((genome.fingerprint, representative.fingerprint), None) for representative in representatives]
+            for genome in genomes
+        ]
+        # Genomes missing any entry are measured against every representative in one matrix
+        uncached = [i for i, row in enumerate(distances) if None in row]
+        misses = sum(row.count(None) for row in distances)
+        self.cache_misses += misses
+        self.cache_hits += len(genomes) * len(representatives) - misses
+        if uncached:
+            matrix = population_distance_matrix([genomes[i] for i in uncached], representatives).tolist()
+            for i, row in zip(uncached, matrix):
+                distances[i] = row
+                for representative, distance in zip(representatives, row):
+                    self.__distance_cache[(genomes[i].fingerprint, representative.fingerprint)] = distance
+        return distances
+
+    def speciate(self, genomes: Sequence[Genome]) -> List[Species]:
+        """
+        Assign every genome to the first species it is compatible with, creating new species as needed
+        """
+        self.cache_hits = 0
+        self.cache_misses = 0
+        for species in self.species:
+            species.members = []
+        existing = list(self.species)
+        distances = self.__distances(genomes, [species.representative for species in existing])
+        for genome, row in zip(genomes, distances):
+            match = next((species for species, distance in zip(existing, row) if distance < self.compatibility_threshold), None)
+            if match is None:
+                # Species created this generation are few, measure against them directly
+                match = next((species for species in self.species[len(existing):] if Genome.distance(genome, species.representative) < self.compatibility_threshold), None)
+            if match is None:
+                match = Species(self.__next_species_id, genome)
+                self.__next_species_id += 1
+                self.species.append(match)
+            match.members.append(genome)
+        self.species = [species for species in self.species if species.members]
+
+        self.__adjust_threshold()
+        return self.species
+
+    def __adjust_threshold(self):
+        direction = (len(self.species) > self.target_species) - (len(self.species) < self.target_species)
+        if direction != 0 and direction == self.__direction:
+            self.__step *= 1.5
+        elif direction != 0 and direction == -self.__direction:
+            self.__step /= 2
+        self.__direction = direction
+        self.compatibility_threshold = max(self.min_threshold, self.compatibility_threshold + direction * self.__step)
+
+    def adjusted_fitness(self, genome_fitness: Dict[Genome, float]) -> Dict[Genome, float]:
+        """
+        Fitness shared among the members of each species
+        """
+        adjusted: Dict[Genome, float] = {}
+        for species in self.species:
+            for genome in species.members:
+                adjusted[genome] = genome_fitness[genome] / len(species.members)
+        return adjusted
+
+    def offspring_quotas(self, genome_fitness: Dict[Genome, float], total: int) -> Dict[int, int]:
+        """
+        Genomes each species contributes to the next generation, proportional to its summed adjusted fitness
+        """
+        adjusted = self.adjusted_fitness(genome_fitness)
+        shares = [sum(adjusted[genome] for genome in species.members) for species in self.species]
+        if sum(shares) <= 0:
+            shares = [float(len(species.members)) for species in self.species]
+        share_sum = sum(shares)
+        exact = [total * share / share_sum for share in shares]
+        quotas = [math.floor(value) for value in exact]
+        # Largest remainder rounding, so the quotas add up to total
+        for i in sorted(range(len(exact)), key=lambda i: exact[i] - quotas[i], reverse=True)[:total - sum(quotas)]:
+            quotas[i] += 1
+        return {species.species_id: quota for species, quota in zip(self.species, quotas)}
+
+    def update_representatives(self, genome_fitness: Dict[Genome, float]):
+        """
+        Fittest member represents its species next generation, elites are copied unchanged so their distances stay cached
+        """
+        for species in self.species:
+            species.representative = max(species.members, key=lambda genome: genome_fitness[genome])
+        representatives = {species.representative.fingerprint for species in self.species}
+        members = {genome.fingerprint for species in self.species for genome in species.members}
+        self.__distance_cache = {
+            key: distance for key, distance in self.__distance_cache.items() if key[0] in members and key[1] in representatives
+        }
@@ -59,7 +59,7 @@ def test_xor():
         inputs=8,
         outputs=4,
         weight_range=(0, 1),
-        number_of_tests=10
+        evaluation_mode='exhaustive',
     )
     neat = XorNeat(config)
     neat.run(500)
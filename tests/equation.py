@@ -6,6 +6,7 @@ from utils.visualize import plot_genome
 from typing import List
 import random
 import math
+import numpy as np
 
 from src.neat import Neat, NeatConfig
 from utils.visualize import plot_genome
@@ -24,6 +25,11 @@ class EquationNeat(Neat):
         difference = ((output - outputs[0]) ** 2) * (1 + math.pow(hidden_nodes, 0.5))
         return 1 / (1 + difference)
     
+    def fitness_batch(self, inputs: np.ndarray, outputs: np.ndarray, hidden_nodes: np.ndarray) -> np.ndarray:
+        output = 2 * inputs[:, 0] + inputs[:, 1]
+        difference = ((output - outputs[:, :, 0]) ** 2) * (1 + np.sqrt(hidden_nodes))[:, None]
+        return 1 / (1 + difference)
+
     def random_input(self):
         return [random.uniform(0, 1), random.uniform(0, 1)]
 
@@ -0,0 +1,94 @@
+import random
+import socket
+import threading
+import time
+
+import pytest
+
+from src.distributed import Coordinator, Worker, receive_message
+from src.gene_store import InnovationRegistry
+from src.genome import Genome
+from src.neat import NeatConfig
+from src.node_gene import NodeGene
+from tests.xor import XorNeat
+from utils.enums import NodeType
+
+
+def xor_population(seed: int = 1):
+    random.seed(seed)
+    config = NeatConfig(population_size=0, inputs=8, outputs=4)
+    neat = XorNeat(config)
+    registry = InnovationRegistry(node_count=12)
+    genomes = []
+    for _ in range(8):
+        genome = Genome(registry)
+        for node in range(1, 9):
+            genome.add_node(NodeGene(node, node_type=NodeType.INPUT))
+        for node in range(9, 13):
+            genome.add_node(NodeGene(node, node_type=NodeType.OUTPUT))
+            for input_node in range(1, 9):
+                genome.create_connection(input_node, node, weight=random.uniform(-1, 1))
+        for _ in range(5):
+            genome.mutate()
+        genomes.append(genome)
+    networks = [genome.network for genome in genomes]
+    hidden_nodes = [genome.hidden_node_count for genome in genomes]
+    test_input = [neat.random_input() for _ in range(6)]
+    return neat, config, networks, hidden_nodes, test_input
+
+
+def start_worker(coordinator: Coordinator) -> Worker:
+    worker = Worker(*coordinator.address, heartbeat_interval=0.05, connect_timeout=2.0)
+    threading.Thread(target=worker.run, daemon=True).start()
+    return worker
+
+
+def wait_for_workers(coordinator: Coordinator, count: int):
+    deadline = time.monotonic() + 2.0
+    while coordinator.worker_count != count:
+        assert time.monotonic() < deadline, "Worker did not connect"
+        time.sleep(0.01)
+
+
+def test_workers_match_local_evaluation():
+    neat, config, networks, hidden_nodes, test_input = xor_population()
+    with Coordinator(heartbeat_timeout=1.0) as coordinator:
+        workers = [start_worker(coordinator) for _ in range(2)]
+        fitness = coordinator.evaluate(XorNeat, config, networks, hidden_nodes, test_input, chunk_size=3, timeout=2.0)
+        for worker in workers:
+            worker.stop()
+    assert fitness == pytest.approx(neat.evaluate_networks(networks, hidden_nodes, test_input))
+
+
+def test_evaluate_times_out_without_workers():
+    _, config, networks, hidden_nodes, test_input = xor_population()
+    with Coordinator() as coordinator:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            coordinator.evaluate(XorNeat, config, networks, hidden_nodes, test_input, timeout=0.2)
+        assert time.monotonic() - started < 2.0
+        # The abandoned tasks are not handed to workers connecting later
+        worker = start_worker(coordinator)
+        fitness = coordinator.evaluate(XorNeat, config, networks[:2], hidden_nodes[:2], test_input, timeout=2.0)
+        worker.stop()
+    assert len(fitness) == 2
+
+
+def test_silent_worker_task_is_queued_again():
+    neat, config, networks, hidden_nodes, test_input = xor_population()
+    with Coordinator(heartbeat_timeout=0.3) as coordinator:
+        # Takes a task and never answers or sends heartbeats
+        silent = socket.create_connection(coordinator.address)
+        wait_for_workers(coordinator, 1)
+        result = {}
+        evaluation = threading.Thread(target=lambda: result.update(fitness=coordinator.evaluate(
+            XorNeat, config, networks, hidden_nodes, test_input, chunk_size=len(networks), timeout=5.0)))
+        evaluation.start()
+        assert receive_message(silent)['type'] == 'job'
+        assert receive_message(silent)['type'] == 'task'
+        worker = start_worker(coordinator)
+        evaluation.join(5.0)
+        worker.stop()
+        silent.close()
+    assert not evaluation.is_alive()
+    assert result['fitness'] == pytest.approx(neat.evaluate_networks(networks, hidden_nodes, test_input))
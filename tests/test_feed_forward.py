@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+
+from src.gene_store import InnovationRegistry
+from src.genome import Genome
+from src.graph_mapper import populate_nodes
+from src.node_gene import NodeGene
+from utils.enums import NodeType
+
+
+def random_genomes(count: int = 300, inputs: int = 3, outputs: int = 2, seed: int = 11):
+    random.seed(seed)
+    registry = InnovationRegistry(node_count=inputs + outputs)
+    genomes = []
+    for _ in range(count):
+        genome = Genome(registry)
+        for node in range(1, inputs + 1):
+            genome.add_node(NodeGene(node, node_type=NodeType.INPUT))
+        for node in range(inputs + 1, inputs + outputs + 1):
+            genome.add_node(NodeGene(node, node_type=NodeType.OUTPUT))
+            for input_node in range(1, inputs + 1):
+                genome.create_connection(input_node, node, weight=random.uniform(-1, 1))
+        for _ in range(random.randint(0, 40)):
+            genome.mutate()
+        genomes.append(genome)
+    return genomes
+
+
+def test_compiled_plan_matches_populate_nodes():
+    genomes = random_genomes()
+    assert sum(genome.hidden_node_count for genome in genomes) > 100
+    tests = np.random.default_rng(5).uniform(-1, 1, (8, 3))
+    for genome in genomes:
+        expected = [populate_nodes(list(genome.connection_genes), list(genome.node_genes), *test_input) for test_input in tests.tolist()]
+        network = genome.network
+        calculate_result = network.compile_function()
+        np.testing.assert_allclose([network.activate(*test_input) for test_input in tests.tolist()], expected, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose([calculate_result(*test_input) for test_input in tests.tolist()], expected, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(network.activate_batch(tests), expected, rtol=1e-12, atol=1e-12)
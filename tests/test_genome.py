@@ -0,0 +1,86 @@
+import random
+
+from src.gene_store import InnovationRegistry
+from src.genome import Genome
+from src.node_gene import NodeGene
+from utils.enums import NodeType
+
+
+def grown_genome(seed: int = 1, inputs: int = 4, outputs: int = 2, node_mutations: int = 10, connection_mutations: int = 10) -> Genome:
+    random.seed(seed)
+    genome = Genome(InnovationRegistry(node_count=inputs + outputs))
+    for node in range(1, inputs + 1):
+        genome.add_node(NodeGene(node, node_type=NodeType.INPUT))
+    for node in range(inputs + 1, inputs + outputs + 1):
+        genome.add_node(NodeGene(node, node_type=NodeType.OUTPUT))
+        for input_node in range(1, inputs + 1):
+            genome.create_connection(input_node, node, weight=random.uniform(-1, 1))
+    for _ in range(node_mutations):
+        genome.node_mutation()
+    for _ in range(connection_mutations):
+        genome.connection_mutation()
+    return genome
+
+
+def expected_candidates(genome: Genome):
+    x_axis = {node.innovation_number: node.x_axis for node in genome.node_genes}
+    return {
+        (from_node, to_node) for from_node in x_axis for to_node in x_axis
+        if x_axis[from_node] < x_axis[to_node] and not genome.has_connection(from_node, to_node)
+    }
+
+
+def test_copy_of_copy_updates_shared_connection_candidates():
+    genome = grown_genome()
+    candidates = list(genome.connection_candidates)
+    grandchild = genome.copy().copy()
+    grandchild.connection_mutation()
+    added = next(pair for pair in candidates if grandchild.has_connection(*pair))
+
+    # The pair is swap removed from the parent's list, a list built again from every node pair would be in another order
+    position = candidates.index(added)
+    last = candidates.pop()
+    if position < len(candidates):
+        candidates[position] = last
+    assert grandchild.connection_candidates == candidates
+    assert set(grandchild.connection_candidates) == expected_candidates(grandchild)
+    assert set(genome.connection_candidates) == expected_candidates(genome)
+    assert not genome.has_connection(*added)
+
+
+def genome_state(genome: Genome):
+    nodes = sorted((node.innovation_number, int(node.node_type), node.x_axis) for node in genome.node_genes)
+    connections = sorted(
+        (connection.innovation_number, connection.from_node, connection.to_node, connection.weight, connection.enabled)
+        for connection in genome.connection_genes
+    )
+    node_ids = [node.innovation_number for node in genome.node_genes]
+    edges = {(node, target) for node in node_ids for target in genome.outgoing_nodes(node)}
+    return nodes, connections, edges, set(genome.connection_candidates), genome.fingerprint
+
+
+def test_changes_to_a_copy_do_not_reach_the_parent():
+    genome = grown_genome(seed=3)
+    state = genome_state(genome)
+    plan = genome.network.to_dict()
+    inputs = [[random.uniform(-1, 1) for _ in range(4)] for _ in range(5)]
+    outputs = [genome.calculate_result(*test_input) for test_input in inputs]
+    views = genome.connection_genes
+
+    child = genome.copy()
+    grandchild = child.copy()
+    for copy in (child, grandchild):
+        for view in copy.connection_genes:
+            view.set_weight(-view.weight / 2)
+        copy.node_mutation()
+        copy.connection_mutation()
+        copy.weight_mutation()
+        copy.connection_genes[0].mutate_enabled()
+
+    assert genome_state(genome) == state
+    # Views handed out before the copies were made still read the parent's genes
+    assert [(view.weight, view.enabled) for view in views] == [(view.weight, view.enabled) for view in genome.connection_genes]
+    assert genome.network.to_dict() == plan
+    assert [genome.calculate_result(*test_input) for test_input in inputs] == outputs
+    assert genome_state(child) != state
+    assert genome_state(grandchild) != genome_state(child)
@@ -0,0 +1,45 @@
+import random
+
+import numpy as np
+
+from src.array_genome import ArrayGenome
+from src.distance import population_distance_matrix
+from src.gene_store import InnovationRegistry
+from src.node_gene import NodeGene
+from src.population_arena import PopulationArena, arena_slots
+from src.population_evaluator import PopulationEvaluator
+from utils.enums import NodeType
+
+
+def arena_population(seed: int = 9, size: int = 60):
+    random.seed(seed)
+    arena = PopulationArena()
+    registry = InnovationRegistry(node_count=5)
+    genomes = []
+    for _ in range(size):
+        genome = ArrayGenome(registry, arena=arena)
+        for node in range(1, 4):
+            genome.add_node(NodeGene(node, node_type=NodeType.INPUT))
+        for node in (4, 5):
+            genome.add_node(NodeGene(node, node_type=NodeType.OUTPUT))
+            for input_node in range(1, 4):
+                genome.create_connection(input_node, node, weight=random.uniform(-1, 1))
+        for _ in range(random.randint(0, 40)):
+            genome.mutate()
+        genomes.append(genome)
+    # Slots out of allocation order
+    return arena, genomes[::2] + genomes[1::2]
+
+
+def test_arena_evaluator_matches_compiled_networks():
+    arena, genomes = arena_population()
+    inputs = np.random.default_rng(2).random((9, 3))
+    outputs = arena.evaluator(arena_slots(genomes)).evaluate(inputs)
+    assert np.array_equal(outputs, PopulationEvaluator.create([genome.network for genome in genomes]).evaluate(inputs))
+
+
+def test_arena_distances_match_genome_distance():
+    _, genomes = arena_population()
+    representatives = genomes[:7]
+    expected = [[ArrayGenome.distance(genome, representative) for representative in representatives] for genome in genomes]
+    assert np.allclose(population_distance_matrix(genomes, representatives), expected)
@@ -1,6 +1,8 @@
 from typing import List
+import itertools
 import random
 import math
+import numpy as np
 from src.neat import Neat, NeatConfig
 from utils.visualize import plot_genome
 
@@ -23,6 +25,28 @@ class XorNeat(Neat):
         difference = ((output - output_from_network)** 2) * (1 + math.pow(hidden_nodes, 0.5))
         return 1 / (1 + difference)
 
+    def fitness_batch(self, inputs: np.ndarray, outputs: np.ndarray, hidden_nodes: np.ndarray) -> np.ndarray:
+        bit_values = np.array([8, 4, 2, 1])
+        expected_outputs = self.expected_outputs
+        if expected_outputs is not None and len(expected_outputs) == len(inputs):
+            # Exhaustive evaluation, the inputs are input_domain in order and their outputs are computed once per run
+            output = expected_outputs @ bit_values
+        else:
+            numbers = inputs.astype(np.int64)
+            output = (numbers[:, :4] @ bit_values) ^ (numbers[:, 4:] @ bit_values)
+        output_from_network = (outputs > 0.5) @ bit_values
+        difference = ((output - output_from_network) ** 2) * (1 + np.sqrt(hidden_nodes))[:, None]
+        return 1 / (1 + difference)
+
+    def input_domain(self):
+        # Every pair of 4 bit numbers, for NeatConfig(evaluation_mode='exhaustive')
+        return [list(bits) for bits in itertools.product([0, 1], repeat=8)]
+
+    def expected_output(self, inputs: List[float]):
+        a1, a2, a3, a4, b1, b2, b3, b4 = inputs
+        output = (a1 * 8 + a2 * 4 + a3 * 2 + a4) ^ (b1 * 8 + b2 * 4 + b3 * 2 + b4)
+        return [(output >> 3) & 1, (output >> 2) & 1, (output >> 1) & 1, output & 1]
+
     def random_input(self):
         # return [1,0]
         return [